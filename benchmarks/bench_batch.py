@@ -0,0 +1,78 @@
+"""Run the Message Batches path (main.py --batch) offline through every outcome.
+
+Each scenario summarizes a fresh set of channels with summarize_videos_batch
+against the fake batches in fakes.py and prints its timing and outcome (the
+outcomes are checked by test_batch.py):
+
+    success   every batch request succeeds
+    errors    some requests end as errored or expired; those videos are left out
+    timeout   the batch never ends, so it is cancelled after BATCH_TIMEOUT_MINUTES
+              and the videos are summarized directly instead
+
+    python benchmarks/bench_batch.py [--channels 10] [--error-rate 0.2]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from fakes import Fakes, Latency, channel_ids  # sets up env and sys.path first
+
+import summarizer  # noqa: E402
+import youtube_client  # noqa: E402
+
+
+def run_scenario(fakes: Fakes, name: str, channels: int) -> tuple[list[dict], list[dict], float]:
+    """Summarize `channels` new channels in batch mode. Returns (videos, results, seconds)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        videos = youtube_client.fetch_videos_with_transcripts(channel_ids(channels, run=f"batch-{name}"))
+        start = time.perf_counter()
+        results = summarizer.summarize_videos_batch(videos)
+        elapsed = time.perf_counter() - start
+    return videos, results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--channels", type=int, default=10, help="Channels per scenario")
+    parser.add_argument("--error-rate", type=float, default=0.2,
+                        help="Share of batch requests that end as errored, and again as expired")
+    parser.add_argument("--claude-latency", type=float, default=0.01,
+                        help="Simulated seconds per Claude call")
+    args = parser.parse_args()
+
+    fakes = Fakes(Latency(claude=args.claude_latency), caption_failure_rate=0.0)
+    fakes.install()
+    batches = fakes.claude.messages.batches
+
+    # success: one batch, every video summarized from it
+    calls = fakes.claude.calls
+    videos, results, elapsed = run_scenario(fakes, "success", args.channels)
+    succeeded = batches.outcomes["succeeded"]
+    print(f"success  {elapsed * 1000:8.1f} ms   {len(results)}/{len(videos)} video(s), "
+          f"{succeeded} batch result(s), {fakes.claude.calls - calls - succeeded} direct call(s)")
+
+    # errors: errored and expired requests are reported and left out
+    batches.errored_rate = batches.expired_rate = args.error_rate
+    before = batches.outcomes.copy()
+    videos, results, elapsed = run_scenario(fakes, "errors", args.channels)
+    outcomes = batches.outcomes - before
+    print(f"errors   {elapsed * 1000:8.1f} ms   {len(results)}/{len(videos)} video(s), "
+          f"{outcomes['errored']} errored, {outcomes['expired']} expired")
+    batches.errored_rate = batches.expired_rate = 0.0
+
+    # timeout: the batch is cancelled and its videos are summarized directly
+    batches.polls_to_end = None
+    summarizer.BATCH_TIMEOUT_MINUTES = 0
+    cancelled = batches.cancelled
+    videos, results, elapsed = run_scenario(fakes, "timeout", args.channels)
+    print(f"timeout  {elapsed * 1000:8.1f} ms   {len(results)}/{len(videos)} video(s), "
+          f"{batches.cancelled - cancelled} batch(es) cancelled")
+
+    print("\nClaude usage by stage:")
+    for line in summarizer.usage.stage_lines():
+        print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark caption parsing on synthetic multi-hour livestream auto-captions.
+
+Compares the original regex-per-line VTT parser with captions.parse_vtt (from a
+string and streamed from a file) and reports time, peak memory and output size.
+
+    python benchmarks/bench_captions.py [--hours 4]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from captions import parse_caption_file, parse_vtt  # noqa: E402
+
+WORDS = (
+    "the market is testing support at resistance bitcoin spy nasdaq we need to see a close above "
+    "below this level volume is rising falling on the daily chart weekly trend lower highs higher lows "
+    "fed cpi earnings next week rates inflation bulls bears target stop entry"
+).split()
+
+
+def legacy_parse_vtt(vtt_text: str) -> str:
+    """The parser this repo shipped before captions.py, kept as the baseline."""
+    lines = []
+    for line in vtt_text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("WEBVTT"):
+            continue
+        if line.startswith("Kind:") or line.startswith("Language:"):
+            continue
+        if "-->" in line:
+            continue
+        if re.match(r"^\d+$", line):
+            continue
+        clean = re.sub(r"<[^>]+>", "", line)
+        if clean.strip():
+            lines.append(clean.strip())
+
+    deduped = []
+    for line in lines:
+        if not deduped or line != deduped[-1]:
+            deduped.append(line)
+
+    return " ".join(deduped)
+
+
+def _timestamp(seconds: float) -> str:
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{int(h):02d}:{int(m):02d}:{s:06.3f}"
+
+
+def synthetic_auto_vtt(hours: float, seed: int = 0) -> str:
+    """YouTube-style rolling auto-captions: each phrase appears in three cues."""
+    rng = random.Random(seed)
+    out = ["WEBVTT", "Kind: captions", "Language: en", ""]
+    previous = ""
+    t = 0.0
+    while t < hours * 3600:
+        phrase = [rng.choice(WORDS) for _ in range(rng.randint(5, 9))]
+        timed = phrase[0] + "".join(
+            f"<{_timestamp(t + 0.3 * i)}><c> {w}</c>" for i, w in enumerate(phrase[1:], start=1)
+        )
+        plain = " ".join(phrase)
+        # Cue 1: previous line + new line with word timings
+        out += [f"{_timestamp(t)} --> {_timestamp(t + 2)} align:start position:0%", previous, timed, ""]
+        # Cue 2: the new line on its own (10ms "hold" cue)
+        out += [f"{_timestamp(t + 2)} --> {_timestamp(t + 2.01)} align:start position:0%", plain, " ", ""]
+        # Cue 3: new line repeated above the next one
+        out += [f"{_timestamp(t + 2.01)} --> {_timestamp(t + 4)} align:start position:0%", plain, ""]
+        previous = plain
+        t += 4
+    return "\n".join(out)
+
+
+def synthetic_sliding_vtt(hours: float, seed: int = 0) -> str:
+    """Captions as a sliding window: each cue repeats most of the previous cue's words."""
+    rng = random.Random(seed)
+    out = ["WEBVTT", "Kind: captions", "Language: en", ""]
+    window = [rng.choice(WORDS) for _ in range(8)]
+    t = 0.0
+    while t < hours * 3600:
+        out += [f"{_timestamp(t)} --> {_timestamp(t + 1.5)}", " ".join(window), ""]
+        window = window[3:] + [rng.choice(WORDS) for _ in range(3)]
+        t += 1.5
+    return "\n".join(out)
+
+
+def measure(label: str, fn, *args, repeat: int = 3) -> None:
+    """Best-of-`repeat` wall time, then peak memory from a separate traced run."""
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<28} {elapsed * 1000:9.1f} ms   peak {peak / 1e6:7.1f} MB   "
+        f"output {len(result) / 1e3:8.1f} kB ({len(result.split())} words)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=4.0, help="Length of the synthetic stream")
+    args = parser.parse_args()
+
+    for name, generate in (
+        ("auto-caption", synthetic_auto_vtt),
+        ("sliding-window", synthetic_sliding_vtt),
+    ):
+        vtt = generate(args.hours)
+        print(f"Synthetic {args.hours:g}h {name} VTT: {len(vtt) / 1e6:.1f} MB")
+
+        with tempfile.NamedTemporaryFile("w", suffix=".vtt", encoding="utf-8", delete=False) as f:
+            f.write(vtt)
+            path = f.name
+        try:
+            measure("legacy _parse_vtt", legacy_parse_vtt, vtt)
+            measure("parse_vtt (string)", lambda text: parse_vtt(text.splitlines()), vtt)
+            measure("parse_caption_file (stream)", parse_caption_file, path)
+        finally:
+            os.unlink(path)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark transcript fetching behind the real youtube.com rate limiter.
+
+The other benchmarks lift the request pacing. Here every caption layer attempt
+takes `--tokens-per-call` tokens from the real limiter, so the interaction of
+limiter waits with hedging (see youtube_client._fetch_transcript) shows up:
+hedges only spend more tokens, so the backup layer should hardly ever run.
+
+    python benchmarks/bench_hedging.py [--rps 5] [--workers 4] [--videos 40] [--tokens-per-call 2]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rps", type=float, default=5.0, help="youtube.com requests per second")
+    parser.add_argument("--workers", type=int, default=4, help="FETCH_CONCURRENCY")
+    parser.add_argument("--videos", type=int, default=40)
+    parser.add_argument("--tokens-per-call", type=int, default=2,
+                        help="Rate limiter tokens each caption layer attempt takes")
+    parser.add_argument("--layer-latency", type=float, default=0.05,
+                        help="Simulated seconds per caption layer attempt, on top of the limiter")
+    parser.add_argument("--hedge-after", type=float, default=0.5, help="HEDGE_AFTER_SECONDS")
+    return parser.parse_args()
+
+
+def run(videos: int, tokens_per_call: int, layer_latency: float) -> dict:
+    """Fetch transcripts for `videos` fake videos. Returns the counts and timings."""
+    from fakes import Fakes, Latency  # sets up env and sys.path first
+
+    import youtube_client
+
+    fakes = Fakes(Latency(captions=layer_latency), caption_failure_rate=0.0, limiter_tokens=tokens_per_call)
+    fakes.install(rate_limited=True)
+    primary, backup = youtube_client.layer_stats.plan()[:2]
+    entries = [
+        {"video_id": f"hedge{i:06d}", "title": f"Video {i}", "channel": "Channel", "full_description": ""}
+        for i in range(videos)
+    ]
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        fetched = list(youtube_client.iter_videos_with_transcripts(entries))
+        elapsed = time.perf_counter() - start
+    return {
+        "fetched": len(fetched),
+        "primary_calls": fakes.captions.calls_by_layer[primary],
+        "backup_calls": fakes.captions.calls_by_layer[backup],
+        "seconds": elapsed,
+    }
+
+
+def main():
+    args = parse_args()
+    # Read by config.py, so set before the pipeline modules are imported
+    os.environ["YOUTUBE_REQUESTS_PER_SECOND"] = str(args.rps)
+    os.environ["FETCH_CONCURRENCY"] = str(args.workers)
+    os.environ["HEDGE_AFTER_SECONDS"] = str(args.hedge_after)
+
+    result = run(args.videos, args.tokens_per_call, args.layer_latency)
+    ideal = args.videos * args.tokens_per_call / args.rps
+    print(
+        f"{result['fetched']}/{args.videos} transcript(s) in {result['seconds']:.1f}s "
+        f"(limiter-bound ideal {ideal:.1f}s), {result['primary_calls']} primary and "
+        f"{result['backup_calls']} backup layer call(s) (hedges)"
+    )
+    # Before this run has any samples, the smoothed latency may call for a hedge
+    # on each worker's first video
+    if result["backup_calls"] > args.workers:
+        print("Hedging is fighting the rate limiter")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark the digest pipeline offline, from 5 to 500 channels.
+
+YouTube, the caption layers and Claude are replaced by the fakes in fakes.py,
+which replay the recorded responses in benchmarks/fixtures/ with optional
+simulated latency. Each stage is timed on a cold cache and, where the stage
+is cached, again on a warm one.
+
+    python benchmarks/bench_pipeline.py [--channels 5 50 500] [--claude-latency 0.05]
+    python benchmarks/bench_pipeline.py --save before.json
+    python benchmarks/bench_pipeline.py --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+
+from fakes import Fakes, Latency, channel_ids  # sets up env and sys.path first
+
+import youtube_client  # noqa: E402
+from email_render import build_email_html  # noqa: E402
+from summarizer import generate_overall_digest, summarize_videos, usage  # noqa: E402
+
+
+def timed(fn, *args):
+    """Run fn(*args) with its progress output discarded. Returns (result, seconds)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+    return result, elapsed
+
+
+def parse_all(vtt: str, count: int) -> None:
+    for _ in range(count):
+        youtube_client._parse_vtt(vtt)
+
+
+def run_workload(fakes: Fakes, channels: int) -> dict:
+    """Time every stage for `channels` channels. Returns {stage: seconds}."""
+    ids = channel_ids(channels, run=f"channels-{channels}")
+    youtube_calls, claude_calls = fakes.youtube.calls, fakes.claude.calls
+    results = {}
+
+    videos, results["fetch_videos_with_transcripts (cold)"] = timed(
+        youtube_client.fetch_videos_with_transcripts, ids
+    )
+    _, results["fetch_videos_with_transcripts (warm)"] = timed(
+        youtube_client.fetch_videos_with_transcripts, ids
+    )
+    _, results["_parse_vtt"] = timed(parse_all, fakes.captions.vtt, len(videos))
+
+    # summarize_videos runs summarize_video for each video, SUMMARY_CONCURRENCY at a time
+    # (skipped videos have no cached summary, so they are triaged again when warm)
+    summarized, results["summarize_video (cold)"] = timed(summarize_videos, videos)
+    _, results["summarize_video (warm)"] = timed(summarize_videos, videos)
+    duplicates = sum(1 for r in summarized if "duplicate_of" in r)
+    analyzed = [
+        r for r in summarized
+        if "duplicate_of" not in r and r.get("triage", {}).get("verdict", "keep") == "keep"
+    ]
+
+    prompt_chars = fakes.claude.prompt_chars
+    digest, results["generate_overall_digest"] = timed(generate_overall_digest, analyzed)
+    digest_prompt_chars = fakes.claude.prompt_chars - prompt_chars
+
+    html, results["build_email_html"] = timed(build_email_html, digest, analyzed)
+
+    print(
+        f"{channels} channel(s): {len(videos)} video(s), {duplicates} duplicate(s), "
+        f"{len(summarized) - len(analyzed) - duplicates} skipped by triage, "
+        f"{fakes.youtube.calls - youtube_calls} Data API call(s), "
+        f"{fakes.claude.calls - claude_calls} Claude call(s), digest prompt {digest_prompt_chars / 1e3:.0f} kB, "
+        f"email {len(html) / 1e3:.0f} kB"
+    )
+    return results
+
+
+def print_results(all_results: dict, baseline: dict) -> None:
+    for workload, results in all_results.items():
+        print(f"\n{workload} channel(s)")
+        for stage, seconds in results.items():
+            line = f"  {stage:<40} {seconds * 1000:10.1f} ms"
+            before = baseline.get(workload, {}).get(stage)
+            if before:
+                line += f"   {(seconds - before) / before:+7.1%} vs baseline"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--channels", type=int, nargs="+", default=[5, 50, 500],
+                        help="Workload sizes (number of channels)")
+    parser.add_argument("--videos-per-channel", type=int, default=2)
+    parser.add_argument("--youtube-latency", type=float, default=0.01,
+                        help="Simulated seconds per Data API call")
+    parser.add_argument("--caption-latency", type=float, default=0.02,
+                        help="Simulated seconds per caption layer attempt")
+    parser.add_argument("--claude-latency", type=float, default=0.05,
+                        help="Simulated seconds per Claude call")
+    parser.add_argument("--caption-failure-rate", type=float, default=0.1,
+                        help="Share of videos the first caption layer has no captions for")
+    parser.add_argument("--triage-skip-rate", type=float, default=0.1,
+                        help="Share of videos triage rules out")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05,
+                        help="Share of videos that are re-uploads of the same video")
+    parser.add_argument("--save", metavar="PATH", help="Write the timings as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="Show changes against timings saved earlier")
+    args = parser.parse_args()
+
+    fakes = Fakes(
+        Latency(args.youtube_latency, args.caption_latency, args.claude_latency),
+        videos_per_channel=args.videos_per_channel,
+        caption_failure_rate=args.caption_failure_rate,
+        triage_skip_rate=args.triage_skip_rate,
+        duplicate_rate=args.duplicate_rate,
+    )
+    fakes.install()
+
+    all_results = {str(n): run_workload(fakes, n) for n in args.channels}
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(all_results, baseline)
+
+    print("\nClaude usage by stage (all workloads, replayed fixtures):")
+    for line in usage.stage_lines():
+        print(f"  {line}")
+    print(f"  total: {usage}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(all_results, f, indent=2)
+        print(f"\nTimings written to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
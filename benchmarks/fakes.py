@@ -0,0 +1,452 @@
+"""Offline stand-ins for YouTube and Claude, replaying the recorded responses in fixtures/.
+
+Importing this module points the pipeline at dummy credentials and a fresh
+temporary CACHE_DIR (so benchmarks never touch the real caches), and puts src/
+on sys.path. It must be imported before any pipeline module.
+"""
+import copy
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(HERE, "fixtures")
+
+for _name in ("YOUTUBE_API_KEY", "ANTHROPIC_API_KEY", "GMAIL_APP_PASSWORD"):
+    os.environ.setdefault(_name, "offline-benchmark")
+os.environ.setdefault("GMAIL_ADDRESS", "digest@example.com")
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="youtube-digest-bench-")
+
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+import anthropic  # noqa: E402
+
+import summarizer  # noqa: E402
+import youtube_client  # noqa: E402
+
+
+def load_fixture(name: str):
+    """Contents of a fixture file: parsed JSON for .json files, text otherwise."""
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return json.load(f) if name.endswith(".json") else f.read()
+
+
+def _stable_fraction(*parts: str) -> float:
+    """Deterministic number in [0, 1) derived from the given strings."""
+    digest = hashlib.sha256("\0".join(parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def channel_ids(count: int, run: str = "bench") -> list[str]:
+    """`count` distinct, valid-looking channel ids. Use a new `run` for a cold cache."""
+    return [
+        "UC" + hashlib.sha256(f"{run}/{i}".encode()).hexdigest()[:22]
+        for i in range(count)
+    ]
+
+
+class Latency:
+    """Simulated round-trip times in seconds, so concurrency changes show up in timings."""
+
+    def __init__(self, youtube: float = 0.0, captions: float = 0.0, claude: float = 0.0):
+        self.youtube = youtube
+        self.captions = captions
+        self.claude = claude
+
+
+# ---------------------------------------------------------------------------
+# YouTube Data API
+# ---------------------------------------------------------------------------
+
+class _Request:
+    def __init__(self, respond, latency: float):
+        self._respond = respond
+        self._latency = latency
+
+    def execute(self) -> dict:
+        if self._latency:
+            time.sleep(self._latency)
+        return self._respond()
+
+
+class _Resource:
+    def __init__(self, respond, latency: float):
+        self._respond = respond
+        self._latency = latency
+
+    def list(self, **params) -> _Request:
+        return _Request(lambda: self._respond(params), self._latency)
+
+
+class FakeYouTube:
+    """The slice of googleapiclient's youtube v3 service the pipeline uses.
+
+    Every channel has `videos_per_channel` recent uploads, built from the recorded
+    search.list and videos.list responses with per-channel ids and titles.
+    """
+
+    def __init__(self, latency: Latency, videos_per_channel: int = 2):
+        self.latency = latency
+        self.videos_per_channel = videos_per_channel
+        self.calls = 0
+        self._search = load_fixture("youtube_search_list.json")
+        self._videos = load_fixture("youtube_videos_list.json")
+        self._snippets = {}
+        self._lock = threading.Lock()
+
+    def _uploads(self, channel_id: str) -> list[tuple[str, dict]]:
+        """(video_id, snippet) for a channel's recent uploads, newest first."""
+        templates = self._search["items"]
+        now = datetime.now(timezone.utc)
+        uploads = []
+        for i in range(self.videos_per_channel):
+            video_id = hashlib.sha256(f"{channel_id}/{i}".encode()).hexdigest()[:11]
+            snippet = copy.deepcopy(templates[i % len(templates)]["snippet"])
+            snippet["channelId"] = channel_id
+            snippet["channelTitle"] = f"Channel {channel_id[-6:]}"
+            snippet["title"] = f"{snippet['title']} #{i + 1}"
+            snippet["publishedAt"] = (now - timedelta(hours=i + 1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+            uploads.append((video_id, snippet))
+        with self._lock:
+            self._snippets.update(uploads)
+        return uploads
+
+    def _count(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def _search_list(self, params: dict) -> dict:
+        self._count()
+        items = [
+            {"kind": "youtube#searchResult", "id": {"kind": "youtube#video", "videoId": video_id}, "snippet": snippet}
+            for video_id, snippet in self._uploads(params["channelId"])
+        ]
+        return {"kind": "youtube#searchListResponse", "items": items[:params.get("maxResults", 5)]}
+
+    def _playlist_items_list(self, params: dict) -> dict:
+        self._count()
+        channel_id = "UC" + params["playlistId"][2:]
+        items = [
+            {
+                "kind": "youtube#playlistItem",
+                "snippet": snippet,
+                "contentDetails": {"videoId": video_id, "videoPublishedAt": snippet["publishedAt"]},
+            }
+            for video_id, snippet in self._uploads(channel_id)
+        ]
+        return {"kind": "youtube#playlistItemListResponse", "items": items[:params.get("maxResults", 5)]}
+
+    def _videos_list(self, params: dict) -> dict:
+        self._count()
+        template = self._videos["items"][0]
+        items = []
+        for video_id in params["id"].split(","):
+            with self._lock:
+                snippet = self._snippets.get(video_id)
+            if snippet is None:
+                continue
+            item = copy.deepcopy(template)
+            item["id"] = video_id
+            item["snippet"].update(
+                {k: snippet[k] for k in ("publishedAt", "channelId", "channelTitle", "title")}
+            )
+            items.append(item)
+        return {"kind": "youtube#videoListResponse", "items": items}
+
+    def search(self) -> _Resource:
+        return _Resource(self._search_list, self.latency.youtube)
+
+    def playlistItems(self) -> _Resource:
+        return _Resource(self._playlist_items_list, self.latency.youtube)
+
+    def videos(self) -> _Resource:
+        return _Resource(self._videos_list, self.latency.youtube)
+
+
+# ---------------------------------------------------------------------------
+# Caption layers
+# ---------------------------------------------------------------------------
+
+class FakeCaptions:
+    """Caption layers that "download" the recorded auto-caption VTT and parse it.
+
+    A deterministic `failure_rate` share of videos has no captions on the first
+    layer, so the fallback path runs too. Every video's transcript is made unique
+    by a word of its own every few words, except for a `duplicate_rate` share
+    that are re-uploads of one and the same video. Each attempt takes
+    `limiter_tokens` tokens from the real youtube.com rate limiter first, as the
+    real layers do (0 leaves the limiter out).
+    """
+
+    TAG_EVERY_WORDS = 6
+
+    def __init__(self, latency: Latency, failure_rate: float = 0.1, repeat: int = 40, duplicate_rate: float = 0.0,
+                 limiter_tokens: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.duplicate_rate = duplicate_rate
+        self.limiter_tokens = limiter_tokens
+        # The fixture is ~30 seconds of captions; repeat it to a ~20 minute video
+        self.vtt = load_fixture("auto_captions_en.vtt") * repeat
+        self.calls = 0
+        self.calls_by_layer = Counter()
+        self._lock = threading.Lock()
+
+    def _fetch(self, layer: str, video_id: str):
+        with self._lock:
+            self.calls += 1
+            self.calls_by_layer[layer] += 1
+        for _ in range(self.limiter_tokens):
+            youtube_client._throttle(youtube_client.YOUTUBE_HOST)
+        if self.latency.captions:
+            time.sleep(self.latency.captions)
+        if layer == youtube_client.CAPTION_LAYERS[0] and _stable_fraction(layer, video_id) < self.failure_rate:
+            return None
+        source = video_id
+        if _stable_fraction("duplicate", video_id) < self.duplicate_rate:
+            source = "reupload"
+        tag = "w" + hashlib.sha256(source.encode()).hexdigest()[:6]
+        words = youtube_client._parse_vtt(self.vtt).split(" ")
+        for i in range(len(words) - len(words) % self.TAG_EVERY_WORDS, 0, -self.TAG_EVERY_WORDS):
+            words.insert(i, tag)
+        return " ".join(words)
+
+    def fetchers(self) -> dict:
+        return {layer: (lambda video_id, layer=layer: self._fetch(layer, video_id))
+                for layer in youtube_client.CAPTION_LAYERS}
+
+
+# ---------------------------------------------------------------------------
+# Anthropic Messages API
+# ---------------------------------------------------------------------------
+
+class _FakeStream:
+    """What client.messages.stream(...) returns, replaying a message's tool input in small chunks."""
+
+    CHUNK_CHARS = 16
+
+    def __init__(self, message: anthropic.types.Message):
+        self._message = message
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __iter__(self):
+        for block in self._message.content:
+            if block.type == "tool_use":
+                text, event_type, attr = json.dumps(block.input), "input_json", "partial_json"
+            else:
+                text, event_type, attr = block.text, "text", "text"
+            for i in range(0, len(text), self.CHUNK_CHARS):
+                yield SimpleNamespace(type=event_type, **{attr: text[i:i + self.CHUNK_CHARS]})
+
+    def get_final_message(self) -> anthropic.types.Message:
+        return self._message
+
+
+class _FakeBatches:
+    """client.messages.batches: message batches answered from the recorded replies.
+
+    A batch ends on the `polls_to_end`-th retrieve (never, if None, so it runs into
+    BATCH_TIMEOUT_MINUTES). Deterministic `errored_rate` and `expired_rate` shares
+    of its requests end as errored or expired instead of succeeded; `outcomes`
+    counts the result types over all batches.
+    """
+
+    def __init__(self, owner: "FakeAnthropic"):
+        self._owner = owner
+        self.polls_to_end = 1
+        self.errored_rate = 0.0
+        self.expired_rate = 0.0
+        self.created = 0
+        self.cancelled = 0
+        self.outcomes = Counter()
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def _result(self, request: dict) -> dict:
+        fraction = _stable_fraction("batch", request["custom_id"])
+        if fraction < self.errored_rate:
+            error = {"type": "overloaded_error", "message": "Overloaded"}
+            return {"type": "errored", "error": {"type": "error", "error": error}}
+        if fraction < self.errored_rate + self.expired_rate:
+            return {"type": "expired"}
+        message = self._owner._create(request["params"])
+        return {"type": "succeeded", "message": message.model_dump()}
+
+    def _batch(self, batch_id: str) -> anthropic.types.messages.MessageBatch:
+        state = self._batches[batch_id]
+        now = datetime.now(timezone.utc)
+        ended = state["status"] == "ended"
+        counts = dict.fromkeys(("processing", "succeeded", "errored", "canceled", "expired"), 0)
+        if ended:
+            for entry in state["results"]:
+                counts[entry["result"]["type"]] += 1
+        else:
+            counts["processing"] = len(state["requests"])
+        return anthropic.types.messages.MessageBatch.model_validate({
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": state["status"],
+            "request_counts": counts,
+            "created_at": now,
+            "expires_at": now + timedelta(days=1),
+            "archived_at": None,
+            "cancel_initiated_at": now if state["cancelled"] else None,
+            "ended_at": now if ended else None,
+            "results_url": f"https://api.anthropic.com/v1/messages/batches/{batch_id}/results" if ended else None,
+        })
+
+    def create(self, requests: list[dict], **_) -> anthropic.types.messages.MessageBatch:
+        with self._lock:
+            self.created += 1
+            batch_id = f"msgbatch_{self.created:04d}"
+            self._batches[batch_id] = {
+                "requests": list(requests), "polls": 0, "status": "in_progress", "cancelled": False, "results": None,
+            }
+        return self._batch(batch_id)
+
+    def retrieve(self, batch_id: str, **_) -> anthropic.types.messages.MessageBatch:
+        state = self._batches[batch_id]
+        state["polls"] += 1
+        if state["status"] == "in_progress" and self.polls_to_end is not None and state["polls"] >= self.polls_to_end:
+            state["results"] = [
+                {"custom_id": request["custom_id"], "result": self._result(request)}
+                for request in state["requests"]
+            ]
+            state["status"] = "ended"
+            self.outcomes.update(entry["result"]["type"] for entry in state["results"])
+        return self._batch(batch_id)
+
+    def cancel(self, batch_id: str, **_) -> anthropic.types.messages.MessageBatch:
+        state = self._batches[batch_id]
+        with self._lock:
+            self.cancelled += 1
+        if state["status"] == "in_progress":
+            state["cancelled"] = True
+            state["status"] = "canceling"
+        return self._batch(batch_id)
+
+    def results(self, batch_id: str, **_):
+        state = self._batches[batch_id]
+        if state["status"] != "ended":
+            raise anthropic.AnthropicError(f"No batch results available yet for {batch_id}")
+        for entry in state["results"]:
+            yield anthropic.types.messages.MessageBatchIndividualResponse.model_validate(entry)
+
+
+class _FakeMessages:
+    def __init__(self, owner: "FakeAnthropic"):
+        self._owner = owner
+        self.batches = _FakeBatches(owner)
+
+    def create(self, **params) -> anthropic.types.Message:
+        return self._owner._create(params)
+
+    def stream(self, **params) -> _FakeStream:
+        return _FakeStream(self._owner._create(params))
+
+
+class FakeAnthropic:
+    """anthropic.Anthropic stand-in that replays the recorded summary and digest replies.
+
+    Each call gets the recorded call of the tool it forces (record_triage,
+    record_analysis or record_digest), as if from the requested model. A
+    deterministic `triage_skip_rate` share of triage calls rules the video out as
+    low-information. Input token usage is estimated from the prompt size, with
+    prompt caching applied to a long enough system prefix. Message
+    batches are answered the same way (see _FakeBatches).
+    """
+
+    # Shortest prefix Sonnet caches
+    CACHE_MIN_TOKENS = 1024
+
+    def __init__(self, latency: Latency, triage_skip_rate: float = 0.0):
+        self.latency = latency
+        self.triage_skip_rate = triage_skip_rate
+        self.messages = _FakeMessages(self)
+        self.calls = 0
+        self.prompt_chars = 0
+        self._recorded = {
+            "record_triage": load_fixture("anthropic_triage_message.json"),
+            "record_analysis": load_fixture("anthropic_summary_message.json"),
+            "record_digest": load_fixture("anthropic_digest_message.json"),
+        }
+        self._cached_prefixes = set()
+        self._lock = threading.Lock()
+
+    def _create(self, params: dict) -> anthropic.types.Message:
+        prompt_chars = sum(
+            len(m["content"]) if isinstance(m["content"], str) else len(json.dumps(m["content"]))
+            for m in params["messages"]
+        )
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += prompt_chars
+        if self.latency.claude:
+            time.sleep(self.latency.claude)
+        tool = params["tool_choice"]["name"]
+        recorded = copy.deepcopy(self._recorded[tool])
+        recorded["model"] = params["model"]
+        prompt = params["messages"][0]["content"]
+        if tool == "record_triage" and _stable_fraction(prompt) < self.triage_skip_rate:
+            recorded["content"][0]["input"] = {"verdict": "low_information", "reason": "Rerun of an older stream."}
+        recorded["usage"].update(self._cache_usage(params, prompt_chars // 4 + 1))
+        return anthropic.types.Message.model_validate(recorded)
+
+    def _cache_usage(self, params: dict, input_tokens: int) -> dict:
+        """Input token counts with prompt caching applied, as the API would report them.
+
+        A prefix (tools + system) up to a cache_control breakpoint is cached if it
+        is at least CACHE_MIN_TOKENS long: written by the first call, read after.
+        """
+        system = params.get("system")
+        if not isinstance(system, list) or not any("cache_control" in block for block in system):
+            return {"input_tokens": input_tokens}
+        prefix = json.dumps(params.get("tools", [])) + "".join(block["text"] for block in system)
+        prefix_tokens = len(prefix) // 4
+        if prefix_tokens < self.CACHE_MIN_TOKENS:
+            return {"input_tokens": input_tokens, "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+        with self._lock:
+            written = prefix in self._cached_prefixes
+            self._cached_prefixes.add(prefix)
+        return {
+            "input_tokens": input_tokens,
+            "cache_creation_input_tokens": 0 if written else prefix_tokens,
+            "cache_read_input_tokens": prefix_tokens if written else 0,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Wiring
+# ---------------------------------------------------------------------------
+
+class Fakes:
+    """All fakes for one benchmark session, installed into the pipeline modules."""
+
+    def __init__(self, latency: Latency, videos_per_channel: int = 2, caption_failure_rate: float = 0.1,
+                 triage_skip_rate: float = 0.0, duplicate_rate: float = 0.0, limiter_tokens: int = 0):
+        self.youtube = FakeYouTube(latency, videos_per_channel)
+        self.captions = FakeCaptions(latency, caption_failure_rate, duplicate_rate=duplicate_rate,
+                                     limiter_tokens=limiter_tokens)
+        self.claude = FakeAnthropic(latency, triage_skip_rate)
+
+    def install(self, rate_limited: bool = False) -> None:
+        """Point the pipeline at the fakes. Unless `rate_limited`, the request pacing is
+        lifted so the pipeline itself is measured."""
+        youtube_client._youtube_service = self.youtube
+        youtube_client._LAYER_FETCHERS.update(self.captions.fetchers())
+        summarizer.client = self.claude
+        if not rate_limited:
+            for host in youtube_client._RATE_LIMITERS:
+                youtube_client._RATE_LIMITERS[host] = youtube_client.TokenBucket(1e9, capacity=1e9)
@@ -0,0 +1,48 @@
+"""The Message Batches path (main.py --batch) through every outcome, against the
+fake batches in fakes.py.
+
+    python -m pytest benchmarks
+"""
+import pytest
+
+from fakes import Fakes, Latency  # sets up env and sys.path first
+
+import summarizer  # noqa: E402
+from bench_batch import run_scenario  # noqa: E402
+
+CHANNELS = 5
+
+
+@pytest.fixture
+def fakes():
+    fakes = Fakes(Latency(claude=0.001), caption_failure_rate=0.0)
+    fakes.install()
+    return fakes
+
+
+def test_success(fakes):
+    batches = fakes.claude.messages.batches
+    videos, results, _ = run_scenario(fakes, "test-success", CHANNELS)
+    assert batches.created == 1
+    assert batches.outcomes["succeeded"] > 0
+    assert [r["video_id"] for r in results] == [v["video_id"] for v in videos]
+    assert all(r["analysis"].get("summary") for r in results)
+
+
+def test_errored_and_expired_are_left_out(fakes):
+    batches = fakes.claude.messages.batches
+    batches.errored_rate = batches.expired_rate = 0.2
+    videos, results, _ = run_scenario(fakes, "test-errors", CHANNELS)
+    lost = batches.outcomes["errored"] + batches.outcomes["expired"]
+    assert batches.outcomes["errored"] > 0 and batches.outcomes["expired"] > 0
+    assert len(results) == len(videos) - lost
+
+
+def test_timeout_cancels_and_summarizes_directly(fakes, monkeypatch):
+    batches = fakes.claude.messages.batches
+    batches.polls_to_end = None
+    monkeypatch.setattr(summarizer, "BATCH_TIMEOUT_MINUTES", 0)
+    videos, results, _ = run_scenario(fakes, "test-timeout", CHANNELS)
+    assert batches.cancelled == 1
+    assert not batches.outcomes
+    assert [r["video_id"] for r in results] == [v["video_id"] for v in videos]
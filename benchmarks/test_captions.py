@@ -0,0 +1,55 @@
+"""Checks on the caption parser against the legacy one, from bench_captions.py.
+
+    python -m pytest benchmarks
+"""
+import os
+import tempfile
+import time
+
+import pytest
+
+from bench_captions import legacy_parse_vtt, synthetic_auto_vtt, synthetic_sliding_vtt
+from captions import parse_caption_file, parse_vtt
+
+HOURS = 1.0
+
+
+def best_time(fn, *args, repeat: int = 5) -> float:
+    """Best-of-`repeat` wall time of fn(*args), in seconds."""
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return elapsed
+
+
+@pytest.fixture(scope="module", params=[synthetic_auto_vtt, synthetic_sliding_vtt], ids=["auto", "sliding"])
+def vtt(request):
+    return request.param(HOURS)
+
+
+def test_stream_matches_string(vtt):
+    with tempfile.NamedTemporaryFile("w", suffix=".vtt", encoding="utf-8", delete=False) as f:
+        f.write(vtt)
+    try:
+        assert parse_caption_file(f.name) == parse_vtt(vtt.splitlines())
+    finally:
+        os.unlink(f.name)
+
+
+def test_no_more_words_than_legacy(vtt):
+    words = len(parse_vtt(vtt.splitlines()).split())
+    assert 0 < words <= len(legacy_parse_vtt(vtt).split())
+
+
+def test_sliding_window_overlap_removed():
+    vtt = synthetic_sliding_vtt(HOURS)
+    # Each cue repeats 5 of the previous cue's 8 words
+    assert len(parse_vtt(vtt.splitlines()).split()) < len(legacy_parse_vtt(vtt).split()) / 2
+
+
+def test_not_slower_than_legacy():
+    vtt = synthetic_auto_vtt(HOURS)
+    legacy = best_time(legacy_parse_vtt, vtt)
+    assert best_time(lambda text: parse_vtt(text.splitlines()), vtt) < 1.2 * legacy
@@ -0,0 +1,60 @@
+"""Checks on the digest email renderer against the legacy one, from bench_email.py.
+
+    python -m pytest benchmarks
+"""
+import gc
+import time
+
+import pytest
+
+from bench_email import (
+    RECIPIENTS,
+    SUBJECT,
+    legacy_build_email_html,
+    stream_to_file,
+    synthetic_digest,
+    synthetic_videos,
+)
+from email_render import build_email_html
+from email_sender import build_message
+
+VIDEOS = 500
+
+
+def best_time(fn, *args, repeat: int = 10) -> float:
+    """Best-of-`repeat` wall time of fn(*args), in seconds, each run after a full collection."""
+    elapsed = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn(*args)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return elapsed
+
+
+@pytest.fixture(scope="module")
+def workload():
+    videos = synthetic_videos(VIDEOS)
+    return synthetic_digest(videos), videos
+
+
+def test_html_escapes_video_text(workload):
+    digest, videos = workload
+    html = build_email_html(digest, videos)
+    assert html.count("SPY &lt; $450? Fed &amp; CPI week") == VIDEOS
+    assert "<LIVE>" not in html
+    assert html.count("&amp;t=42") == VIDEOS
+
+
+def test_html_not_slower_than_legacy(workload):
+    digest, videos = workload
+    legacy = best_time(legacy_build_email_html, digest, videos)
+    assert best_time(build_email_html, digest, videos) < 1.3 * legacy
+
+
+def test_streamed_message_matches_built(workload):
+    digest, videos = workload
+    message = build_message(digest, videos, RECIPIENTS, SUBJECT)
+    assert "Content-Type: text/plain" in message
+    assert "Content-Type: text/html" in message
+    assert stream_to_file(digest, videos) == len(message)
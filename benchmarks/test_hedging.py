@@ -0,0 +1,28 @@
+"""Checks on hedged transcript fetching behind the real rate limiter, from bench_hedging.py.
+
+    python -m pytest benchmarks
+"""
+import fakes  # noqa: F401  sets up env and sys.path first
+
+import youtube_client  # noqa: E402
+from bench_hedging import run  # noqa: E402
+
+RPS = 10.0
+WORKERS = 4
+VIDEOS = 12
+TOKENS_PER_CALL = 2
+
+
+def test_hedging_does_not_fight_the_limiter(monkeypatch):
+    monkeypatch.setattr(youtube_client, "FETCH_CONCURRENCY", WORKERS)
+    monkeypatch.setattr(youtube_client, "HEDGE_AFTER_SECONDS", 0.3)
+    monkeypatch.setitem(
+        youtube_client._RATE_LIMITERS, youtube_client.YOUTUBE_HOST, youtube_client.TokenBucket(RPS)
+    )
+
+    result = run(VIDEOS, TOKENS_PER_CALL, layer_latency=0.02)
+    assert result["fetched"] == VIDEOS
+    # Before any samples, the smoothed latency may call for a hedge on each
+    # worker's first video
+    assert result["backup_calls"] <= WORKERS
+    assert result["seconds"] < 2 * VIDEOS * TOKENS_PER_CALL / RPS
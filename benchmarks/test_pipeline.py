@@ -0,0 +1,79 @@
+"""The stages bench_pipeline.py times, as pytest checks on a small workload.
+
+    python -m pytest benchmarks
+"""
+import pytest
+
+from fakes import Fakes, Latency, channel_ids  # sets up env and sys.path first
+
+import youtube_client  # noqa: E402
+from bench_pipeline import timed  # noqa: E402
+from email_render import build_email_html  # noqa: E402
+from summarizer import generate_overall_digest, summarize_videos  # noqa: E402
+
+CHANNELS = 10
+CLAUDE_LATENCY = 0.05
+
+
+@pytest.fixture(scope="module")
+def fakes():
+    fakes = Fakes(Latency(0.005, 0.01, CLAUDE_LATENCY), caption_failure_rate=0.1, duplicate_rate=0.05)
+    fakes.install()
+    return fakes
+
+
+@pytest.fixture(scope="module")
+def videos(fakes):
+    videos, _ = timed(youtube_client.fetch_videos_with_transcripts, channel_ids(CHANNELS, run="test-pipeline"))
+    return videos
+
+
+@pytest.fixture(scope="module")
+def summarized(fakes, videos):
+    calls = fakes.claude.calls
+    summarized, seconds = timed(summarize_videos, videos)
+    return summarized, fakes.claude.calls - calls, seconds
+
+
+def test_parse_vtt(fakes):
+    text = youtube_client._parse_vtt(fakes.captions.vtt)
+    assert text
+    assert "-->" not in text and "<c>" not in text
+
+
+def test_fetch_warm_uses_transcript_cache(fakes, videos):
+    assert len(videos) >= CHANNELS
+    assert all(video["transcript"] for video in videos)
+
+    caption_calls = sum(fakes.captions.calls_by_layer.values())
+    again, _ = timed(youtube_client.fetch_videos_with_transcripts, channel_ids(CHANNELS, run="test-pipeline"))
+    assert [v["video_id"] for v in again] == [v["video_id"] for v in videos]
+    assert sum(fakes.captions.calls_by_layer.values()) == caption_calls
+
+
+def test_summarize_cold_runs_calls_concurrently(videos, summarized):
+    results, calls, seconds = summarized
+    assert len(results) == len(videos)
+    assert calls >= len(videos)
+    # One call after another would take calls * CLAUDE_LATENCY
+    assert seconds < 0.6 * calls * CLAUDE_LATENCY
+
+
+def test_summarize_warm_uses_summary_cache(fakes, videos, summarized):
+    results, _, cold_seconds = summarized
+    calls = fakes.claude.calls
+    again, seconds = timed(summarize_videos, videos)
+    assert fakes.claude.calls == calls
+    assert [r["analysis"] for r in again] == [r["analysis"] for r in results]
+    assert seconds < cold_seconds / 2
+
+
+def test_digest_and_email(videos, summarized):
+    results, _, _ = summarized
+    analyzed = [r for r in results if "duplicate_of" not in r]
+    digest, _ = timed(generate_overall_digest, analyzed)
+    assert digest.get("market_overview")
+
+    html, _ = timed(build_email_html, digest, analyzed)
+    assert html.count('<a href="https://www.youtube.com/watch?v=') == len(analyzed)
+    assert html.rstrip().endswith("</html>")
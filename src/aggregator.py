@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+from schemas import SENTIMENTS
+
+# How many tickers the digest lists under "top_tickers"
+TOP_TICKERS = 10
+
+# Names and spellings creators (and Claude) use instead of the ticker
+SYMBOL_ALIASES = {
+    "BITCOIN": "BTC",
+    "XBT": "BTC",
+    "ETHEREUM": "ETH",
+    "ETHER": "ETH",
+    "SOLANA": "SOL",
+    "S&P 500": "SPX",
+    "S&P500": "SPX",
+    "SP500": "SPX",
+    "NASDAQ 100": "NDX",
+    "NASDAQ-100": "NDX",
+}
+
+# Words in a price_levels clause that say what kind of level the numbers near
+# them are
+LEVEL_KINDS = (
+    ("support", "support"),
+    ("floor", "support"),
+    ("resistance", "resistance"),
+    ("ceiling", "resistance"),
+    ("target", "target"),
+    ("stop", "stop"),
+    ("entry", "entry"),
+    ("breakout", "breakout"),
+    ("break above", "breakout"),
+    ("breakdown", "breakdown"),
+    ("break below", "breakdown"),
+    ("pivot", "pivot"),
+)
+
+NO_LEVELS = "No specific levels mentioned"
+
+# "NASDAQ:NVDA" exchange prefixes and "BTC-USD" / "ETH/USDT" quote currencies
+_EXCHANGE_PREFIX_RE = re.compile(r"^[A-Z]+:")
+_QUOTE_SUFFIX_RE = re.compile(r"[-/](?:USDT|USDC|USD)$")
+
+# Clauses of a price_levels string: split on ", " / "; " / " and " (not "52,400")
+_CLAUSE_SPLIT_RE = re.compile(r"[,;]\s+|\.\s+|\s+and\s+|\s+then\s+")
+
+# A number, optionally with $ and a k/m multiplier, plus what follows it. Numbers
+# followed by a period, percentage or time unit ("50-day", "5%", "8:30") are not prices.
+_NUMBER_RE = re.compile(
+    r"(?<![\w.])(?P<dollar>\$)?(?P<number>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)(?P<suffix>[kKmM]\b)?"
+    r"(?P<unit>\s*(?:%|percent|-?\s*(?:day|week|month|hour|min|year)|[dD]\b|(?:[dDeEsS])?MA\b|x\b|[ap]m\b|:\d))?"
+)
+_MULTIPLIERS = {"k": 1e3, "m": 1e6}
+
+# Indicator readings and periods directly before a number ("RSI 70", "Q3 2025")
+_INDICATOR_RE = re.compile(r"\b(?:RSI|MACD|ADX|VIX|Q[1-4]|FY)\s*:?\s*$", re.IGNORECASE)
+
+
+def normalize_symbol(raw: str) -> Optional[str]:
+    """Canonical ticker for a symbol as written ("$spy" -> "SPY", "BTC-USD" -> "BTC").
+
+    Returns None for placeholders and empty strings.
+    """
+    symbol = (raw or "").strip().upper().lstrip("$").strip()
+    symbol = _QUOTE_SUFFIX_RE.sub("", _EXCHANGE_PREFIX_RE.sub("", symbol))
+    symbol = SYMBOL_ALIASES.get(symbol, symbol)
+    if not symbol or not any(c.isalnum() for c in symbol):
+        return None
+    return symbol
+
+
+def _level_kinds(clause: str) -> list[tuple[int, str]]:
+    """(position, kind) of every level word in a clause."""
+    lowered = clause.lower()
+    found = []
+    for word, kind in LEVEL_KINDS:
+        start = lowered.find(word)
+        while start != -1:
+            found.append((start, kind))
+            start = lowered.find(word, start + 1)
+    return sorted(found)
+
+
+def _prices(clause: str) -> list[re.Match]:
+    """Number matches in a clause that can be price levels.
+
+    If the clause writes any price with "$", only those count, plus the second
+    number of a "$588-590" range.
+    """
+    matches = [
+        m for m in _NUMBER_RE.finditer(clause)
+        if not m.group("unit") and not _INDICATOR_RE.search(clause, 0, m.start())
+    ]
+    if not any(m.group("dollar") for m in matches):
+        return matches
+
+    prices = []
+    for m in matches:
+        range_end = bool(prices) and clause[prices[-1].end():m.start()].strip() == "-"
+        if m.group("dollar") or range_end:
+            prices.append(m)
+    return prices
+
+
+def parse_levels(price_levels: str) -> list[tuple[str, float]]:
+    """Extract (kind, price) pairs from a ticker's free-text price_levels.
+
+    "Resistance $590, support $575 and $570" -> [("resistance", 590.0),
+    ("support", 575.0), ("support", 570.0)]. Each number takes the kind of the
+    nearest level word before it in its clause, else the first one after it, else
+    the kind of the previous clause ("level" at the start). Where a clause has
+    $-prices, bare numbers in it are ignored.
+    """
+    levels = []
+    kind = "level"
+    for clause in _CLAUSE_SPLIT_RE.split(price_levels or ""):
+        kinds = _level_kinds(clause)
+        for m in _prices(clause):
+            before = [k for pos, k in kinds if pos < m.start()]
+            after = [k for pos, k in kinds if pos > m.start()]
+            if before:
+                kind = before[-1]
+            elif after:
+                kind = after[0]
+            value = float(m.group("number").replace(",", ""))
+            if m.group("suffix"):
+                value *= _MULTIPLIERS[m.group("suffix").lower()]
+            if value > 0:
+                levels.append((kind, value))
+        if kinds:
+            kind = kinds[-1][1]
+    return levels
+
+
+def format_price(value: float) -> str:
+    """"$575", "$48,800", "$1.25"."""
+    if value == int(value):
+        return f"${int(value):,}"
+    return f"${value:,.2f}"
+
+
+def _majority(counts: dict[str, int]) -> str:
+    """Most common sentiment; a tie for first place is neutral."""
+    ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    if not ranked or ranked[0][1] == 0 or (len(ranked) > 1 and ranked[0][1] == ranked[1][1]):
+        return "neutral"
+    return ranked[0][0]
+
+
+def aggregate_tickers(videos: list[dict]) -> list[dict]:
+    """Group every video's analysis.tickers by normalized symbol, most mentioned first.
+
+    Each entry has the symbol, mention_count (videos mentioning it), the overall
+    sentiment and per-sentiment counts, and per channel: its sentiment counts,
+    parsed (kind, price) levels, unparsed price_levels text and theses.
+    """
+    by_symbol = {}
+    for video in videos:
+        seen = set()
+        for ticker in video.get("analysis", {}).get("tickers", []):
+            symbol = normalize_symbol(ticker.get("symbol", ""))
+            if symbol is None or symbol in seen:
+                continue
+            seen.add(symbol)
+
+            sentiment = (ticker.get("sentiment") or "neutral").strip().lower()
+            if sentiment not in SENTIMENTS:
+                sentiment = "neutral"
+
+            entry = by_symbol.setdefault(symbol, {
+                "symbol": symbol,
+                "mention_count": 0,
+                "sentiment_counts": dict.fromkeys(SENTIMENTS, 0),
+                "channels": {},
+            })
+            entry["mention_count"] += 1
+            entry["sentiment_counts"][sentiment] += 1
+
+            channel = entry["channels"].setdefault(video["channel"], {
+                "sentiment_counts": dict.fromkeys(SENTIMENTS, 0),
+                "levels": [],
+                "unparsed_levels": [],
+                "theses": [],
+            })
+            channel["sentiment_counts"][sentiment] += 1
+
+            text = (ticker.get("price_levels") or "").strip()
+            levels = parse_levels(text)
+            for level in levels:
+                if level not in channel["levels"]:
+                    channel["levels"].append(level)
+            if text and not levels and text != NO_LEVELS and text not in channel["unparsed_levels"]:
+                channel["unparsed_levels"].append(text)
+
+            thesis = ticker.get("thesis") or ""
+            if thesis and thesis not in channel["theses"]:
+                channel["theses"].append(thesis)
+
+    for entry in by_symbol.values():
+        entry["sentiment"] = _majority(entry["sentiment_counts"])
+        for channel in entry["channels"].values():
+            channel["sentiment"] = _majority(channel["sentiment_counts"])
+
+    return sorted(by_symbol.values(), key=lambda e: (-e["mention_count"], e["symbol"]))
+
+
+def _describe_levels(levels: list[tuple[str, float]]) -> str:
+    """"Support at $575 and $570, resistance at $590" (kinds in order of first mention)."""
+    by_kind = {}
+    for kind, price in levels:
+        by_kind.setdefault(kind, []).append(format_price(price))
+    parts = [f"{kind} at {' and '.join(prices)}" for kind, prices in by_kind.items()]
+    text = ", ".join(parts)
+    return text[:1].upper() + text[1:]
+
+
+def _channel_levels(data: dict) -> str:
+    """A channel's levels for one ticker: parsed ones described, then any unparsed text."""
+    texts = [_describe_levels(data["levels"])] if data["levels"] else []
+    return "; ".join(texts + data["unparsed_levels"])
+
+
+def key_levels(aggregates: list[dict]) -> list[str]:
+    """Every price level from every channel, one line per ticker and channel.
+
+    E.g. "SPY: Support at $575, resistance at $590 (TheChartGuys)".
+    """
+    lines = []
+    for entry in aggregates:
+        for channel, data in entry["channels"].items():
+            levels = _channel_levels(data)
+            if levels:
+                lines.append(f"{entry['symbol']}: {levels} ({channel})")
+    return lines
+
+
+def ticker_table(aggregates: list[dict]) -> list[dict]:
+    """Compact per-ticker facts for the digest prompt."""
+    table = []
+    for entry in aggregates:
+        channels = {}
+        for channel, data in entry["channels"].items():
+            row = {"sentiment": data["sentiment"]}
+            levels = _channel_levels(data)
+            if levels:
+                row["levels"] = levels
+            if data["theses"]:
+                row["thesis"] = " / ".join(data["theses"])
+            channels[channel] = row
+        table.append({
+            "symbol": entry["symbol"],
+            "mentions": entry["mention_count"],
+            "sentiment": entry["sentiment"],
+            "channels": channels,
+        })
+    return table
+
+
+def top_tickers(aggregates: list[dict], notes: dict[str, str], limit: int = TOP_TICKERS) -> list[dict]:
+    """The digest's top_tickers: exact counts and sentiment, with the narrative from `notes`.
+
+    A ticker without a note falls back to the channels' theses.
+    """
+    result = []
+    for entry in aggregates[:limit]:
+        summary = notes.get(entry["symbol"])
+        if not summary:
+            summary = " / ".join(
+                f"{channel}: {data['theses'][0]}"
+                for channel, data in entry["channels"].items()
+                if data["theses"]
+            )
+        result.append({
+            "symbol": entry["symbol"],
+            "sentiment": entry["sentiment"],
+            "mention_count": entry["mention_count"],
+            "summary": summary,
+        })
+    return result
@@ -0,0 +1,465 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from functools import wraps
+from typing import Optional
+
+from config import (
+    CACHE_DIR,
+    DEDUP_HISTORY_HOURS,
+    SUMMARY_CACHE_TTL_HOURS,
+    TRANSCRIPT_CACHE_TTL_HOURS,
+    TRANSCRIPT_NEGATIVE_TTL_HOURS,
+    TRANSCRIPT_CACHE_MAX_MB,
+)
+
+
+def connect(filename: str) -> sqlite3.Connection:
+    """Open (and create if needed) a SQLite database inside CACHE_DIR."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(
+        os.path.join(CACHE_DIR, filename),
+        check_same_thread=False,
+        isolation_level=None,  # autocommit; every write is a single statement
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def shared_instance(factory):
+    """Turn a zero-argument factory into a thread-safe, open-on-first-use singleton."""
+    lock = threading.Lock()
+    instances = []
+
+    @wraps(factory)
+    def get():
+        with lock:
+            if not instances:
+                instances.append(factory())
+        return instances[0]
+
+    return get
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a piece of text, used to detect changed content."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Transcript cache
+# ---------------------------------------------------------------------------
+
+class TranscriptCache:
+    """Transcripts keyed by video_id, zlib-compressed, with TTL and size-based eviction.
+
+    A row with NULL text is a negative entry ("no transcript available") and is kept
+    for TRANSCRIPT_NEGATIVE_TTL_HOURS so the fallback layers are not retried every run.
+    """
+
+    def __init__(self, filename: str = "transcripts.sqlite3"):
+        self._lock = threading.Lock()
+        self._conn = connect(filename)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transcripts (
+                video_id   TEXT PRIMARY KEY,
+                layer      TEXT,
+                sha256     TEXT,
+                text       BLOB,
+                size       INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS transcripts_fetched_at ON transcripts (fetched_at)"
+        )
+        self.evict()
+
+    def get(self, video_id: str) -> Optional[tuple[Optional[str], Optional[str]]]:
+        """Return (layer, text) for a live entry, or None on a miss.
+
+        For negative entries both layer and text are None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT layer, text FROM transcripts WHERE video_id = ? AND expires_at > ?",
+                (video_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        layer, blob = row
+        text = zlib.decompress(blob).decode("utf-8") if blob is not None else None
+        return layer, text
+
+    def put(self, video_id: str, layer: Optional[str], text: Optional[str]) -> None:
+        """Store the result of a transcript fetch (text=None for "no transcript")."""
+        now = time.time()
+        if text is None or layer == "description":
+            ttl_hours = TRANSCRIPT_NEGATIVE_TTL_HOURS
+        else:
+            ttl_hours = TRANSCRIPT_CACHE_TTL_HOURS
+        blob = zlib.compress(text.encode("utf-8")) if text is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    video_id,
+                    layer,
+                    content_hash(text) if text is not None else None,
+                    blob,
+                    len(blob) if blob is not None else 0,
+                    now,
+                    now + ttl_hours * 3600,
+                ),
+            )
+
+    def evict(self) -> None:
+        """Drop expired entries, then the oldest ones until under TRANSCRIPT_CACHE_MAX_MB."""
+        max_bytes = TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024
+        with self._lock:
+            self._conn.execute("DELETE FROM transcripts WHERE expires_at <= ?", (time.time(),))
+            total = 0
+            cutoff = None
+            for fetched_at, size in self._conn.execute(
+                "SELECT fetched_at, size FROM transcripts ORDER BY fetched_at DESC"
+            ):
+                total += size
+                if total > max_bytes:
+                    cutoff = fetched_at
+                    break
+            if cutoff is not None:
+                self._conn.execute("DELETE FROM transcripts WHERE fetched_at <= ?", (cutoff,))
+
+
+@shared_instance
+def get_transcript_cache() -> TranscriptCache:
+    """Process-wide transcript cache, opened on first use."""
+    return TranscriptCache()
+
+
+# ---------------------------------------------------------------------------
+# Summary cache
+# ---------------------------------------------------------------------------
+
+def summary_key(video_id: str, transcript: str, model: str, prompt: str, prompt_version: str) -> str:
+    """Cache key for one video summary: any change to its inputs is a new key."""
+    parts = [video_id, content_hash(transcript), model, content_hash(prompt), prompt_version]
+    return content_hash("\0".join(parts))
+
+
+class SummaryCache:
+    """Parsed `analysis` dicts keyed by summary_key(), tagged with the prompt version."""
+
+    def __init__(self, filename: str = "summaries.sqlite3"):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = connect(filename)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS summaries (
+                key            TEXT PRIMARY KEY,
+                video_id       TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                analysis       TEXT NOT NULL,
+                created_at     REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "DELETE FROM summaries WHERE created_at <= ?",
+            (time.time() - SUMMARY_CACHE_TTL_HOURS * 3600,),
+        )
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached analysis for `key`, counting the hit or miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT analysis FROM summaries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, video_id: str, prompt_version: str, analysis: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?)",
+                (key, video_id, prompt_version, json.dumps(analysis), time.time()),
+            )
+
+    def invalidate(self, prompt_version: Optional[str] = None) -> int:
+        """Delete summaries made with `prompt_version` (or all of them). Returns the count."""
+        with self._lock:
+            if prompt_version is None:
+                cursor = self._conn.execute("DELETE FROM summaries")
+            else:
+                cursor = self._conn.execute(
+                    "DELETE FROM summaries WHERE prompt_version = ?", (prompt_version,)
+                )
+        return cursor.rowcount
+
+
+@shared_instance
+def get_summary_cache() -> SummaryCache:
+    """Process-wide summary cache, opened on first use."""
+    return SummaryCache()
+
+
+# ---------------------------------------------------------------------------
+# Per-channel polling state
+# ---------------------------------------------------------------------------
+
+class ChannelState:
+    """Per channel: a high-water mark below which every video was included in a digest,
+    plus the ids of videos above it that were included already."""
+
+    def __init__(self, filename: str = "state.sqlite3"):
+        self._lock = threading.Lock()
+        self._conn = connect(filename)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS channel_state (
+                channel_id        TEXT PRIMARY KEY,
+                last_published_at TEXT NOT NULL,
+                last_video_id     TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS seen_videos (
+                channel_id   TEXT NOT NULL,
+                video_id     TEXT NOT NULL,
+                published_at TEXT NOT NULL,
+                PRIMARY KEY (channel_id, video_id)
+            )
+            """
+        )
+
+    def get(self, channel_id: str) -> Optional[tuple[str, str]]:
+        """Return (last_published_at, last_video_id) for a channel, or None if never seen."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT last_published_at, last_video_id FROM channel_state WHERE channel_id = ?",
+                (channel_id,),
+            ).fetchone()
+
+    def advance(self, channel_id: str, published_at: str, video_id: str) -> None:
+        """Move a channel's high-water mark forward (never backwards)."""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO channel_state VALUES (?, ?, ?)
+                ON CONFLICT (channel_id) DO UPDATE SET
+                    last_published_at = excluded.last_published_at,
+                    last_video_id = excluded.last_video_id
+                WHERE excluded.last_published_at > channel_state.last_published_at
+                """,
+                (channel_id, published_at, video_id),
+            )
+
+    def seen(self, channel_id: str) -> set[str]:
+        """Ids of a channel's videos recorded with mark_seen (and not forgotten since)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id FROM seen_videos WHERE channel_id = ?", (channel_id,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def mark_seen(self, channel_id: str, video_id: str, published_at: str) -> None:
+        """Remember that a video was included in a digest."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO seen_videos VALUES (?, ?, ?)",
+                (channel_id, video_id, published_at),
+            )
+
+    def forget_before(self, published_at: str) -> None:
+        """Drop seen videos published before `published_at` (older than any poll returns)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM seen_videos WHERE published_at < ?", (published_at,))
+
+
+@shared_instance
+def get_channel_state() -> ChannelState:
+    """Process-wide channel polling state, opened on first use."""
+    return ChannelState()
+
+
+# ---------------------------------------------------------------------------
+# Transcript layer health
+# ---------------------------------------------------------------------------
+
+class LayerHealthStore:
+    """Smoothed success rate, latency and failure streak per transcript layer."""
+
+    def __init__(self, filename: str = "state.sqlite3"):
+        self._lock = threading.Lock()
+        self._conn = connect(filename)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS layer_health (
+                layer                TEXT PRIMARY KEY,
+                success_rate         REAL NOT NULL,
+                latency_seconds      REAL NOT NULL,
+                consecutive_failures INTEGER NOT NULL,
+                updated_at           REAL NOT NULL
+            )
+            """
+        )
+
+    def load(self) -> dict[str, tuple[float, float, int]]:
+        """Return {layer: (success_rate, latency_seconds, consecutive_failures)}."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT layer, success_rate, latency_seconds, consecutive_failures FROM layer_health"
+            ).fetchall()
+        return {layer: (rate, latency, failures) for layer, rate, latency, failures in rows}
+
+    def save(self, layer: str, success_rate: float, latency_seconds: float, consecutive_failures: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO layer_health VALUES (?, ?, ?, ?, ?)",
+                (layer, success_rate, latency_seconds, consecutive_failures, time.time()),
+            )
+
+
+@shared_instance
+def get_layer_health_store() -> LayerHealthStore:
+    """Process-wide transcript layer health store, opened on first use."""
+    return LayerHealthStore()
+
+
+# ---------------------------------------------------------------------------
+# Near-duplicate history
+# ---------------------------------------------------------------------------
+
+class DuplicateHistory:
+    """Transcript sketches (sampled shingle hashes, see dedup.py) of recently summarized
+    videos, with the summary_key of each video's summary. Kept for DEDUP_HISTORY_HOURS."""
+
+    # Hashes per IN (...) query, well under SQLite's bound-parameter limit
+    QUERY_CHUNK = 500
+
+    def __init__(self, filename: str = "dedup.sqlite3"):
+        self._lock = threading.Lock()
+        self._conn = connect(filename)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS dedup_videos (
+                video_id    TEXT PRIMARY KEY,
+                title       TEXT NOT NULL,
+                channel     TEXT NOT NULL,
+                summary_key TEXT NOT NULL,
+                samples     INTEGER NOT NULL,
+                indexed_at  REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS dedup_hashes (
+                hash     INTEGER NOT NULL,
+                video_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS dedup_hashes_hash ON dedup_hashes (hash);
+            CREATE INDEX IF NOT EXISTS dedup_hashes_video_id ON dedup_hashes (video_id);
+            """
+        )
+        self.evict()
+
+    def add(self, video: dict, summary_key: str, hashes: set[int]) -> None:
+        """Remember a summarized video's sketch (replacing any earlier one)."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM dedup_hashes WHERE video_id = ?", (video["video_id"],))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO dedup_videos VALUES (?, ?, ?, ?, ?, ?)",
+                    (video["video_id"], video["title"], video["channel"], summary_key, len(hashes), time.time()),
+                )
+                self._conn.executemany(
+                    "INSERT INTO dedup_hashes VALUES (?, ?)", ((h, video["video_id"]) for h in hashes)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def shared(self, hashes: set[int]) -> list[tuple[dict, int]]:
+        """(video, number of shared hashes) for every remembered video sharing any of `hashes`.
+
+        Each video is a dict with video_id, title, channel, summary_key and samples.
+        """
+        counts = {}
+        values = list(hashes)
+        with self._lock:
+            for i in range(0, len(values), self.QUERY_CHUNK):
+                chunk = values[i:i + self.QUERY_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT video_id, COUNT(*) FROM dedup_hashes WHERE hash IN ({','.join('?' * len(chunk))}) "
+                    "GROUP BY video_id",
+                    chunk,
+                )
+                for video_id, count in rows:
+                    counts[video_id] = counts.get(video_id, 0) + count
+            matches = []
+            for video_id, count in counts.items():
+                row = self._conn.execute(
+                    "SELECT title, channel, summary_key, samples FROM dedup_videos WHERE video_id = ?",
+                    (video_id,),
+                ).fetchone()
+                if row is not None:
+                    title, channel, key, samples = row
+                    video = {"video_id": video_id, "title": title, "channel": channel,
+                             "summary_key": key, "samples": samples}
+                    matches.append((video, count))
+        return matches
+
+    def evict(self) -> None:
+        """Forget videos indexed more than DEDUP_HISTORY_HOURS ago."""
+        cutoff = time.time() - DEDUP_HISTORY_HOURS * 3600
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM dedup_hashes WHERE video_id IN "
+                "(SELECT video_id FROM dedup_videos WHERE indexed_at <= ?)",
+                (cutoff,),
+            )
+            self._conn.execute("DELETE FROM dedup_videos WHERE indexed_at <= ?", (cutoff,))
+
+
+@shared_instance
+def get_duplicate_history() -> DuplicateHistory:
+    """Process-wide near-duplicate history, opened on first use."""
+    return DuplicateHistory()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local YouTube digest caches.")
+    parser.add_argument(
+        "--invalidate-summaries",
+        metavar="PROMPT_VERSION",
+        nargs="?",
+        const="",
+        help="Delete cached summaries for a prompt version (all versions if omitted)",
+    )
+    args = parser.parse_args()
+
+    if args.invalidate_summaries is not None:
+        count = get_summary_cache().invalidate(args.invalidate_summaries or None)
+        print(f"Deleted {count} cached summary(ies)")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+from typing import Iterable
+
+# Inline VTT markup: <c>, </c>, <00:00:01.234>, <i>, ...
+_TAG_RE = re.compile(r"<[^>]*>")
+
+# How far back (in words) a new caption line is checked for overlap with the text
+# already emitted. YouTube's rolling auto-captions repeat at most a line or two.
+MAX_OVERLAP_WORDS = 32
+
+# Header lines, skipped only before the first cue
+_VTT_HEADER_PREFIXES = ("WEBVTT", "Kind:", "Language:")
+
+# Blocks skipped as a whole when one starts with the keyword: NOTE (comments)
+# anywhere, STYLE and REGION only before the first cue
+_VTT_HEADER_BLOCKS = ("STYLE", "REGION")
+
+
+def _append_words(out: list[str], words: list[str]) -> None:
+    """Append a caption line's words to `out`, skipping words that overlap its tail.
+
+    Auto-generated captions show each phrase in 2-3 consecutive cues, so the start
+    of a line usually repeats the end of the text so far. Only overlaps of two or
+    more words (or the whole line) are removed, to keep genuine repeated words.
+    """
+    if not words:
+        return
+    first = words[0]
+    limit = min(len(words), len(out), MAX_OVERLAP_WORDS)
+    for k in range(limit, 0, -1):
+        if out[-k] == first and out[-k:] == words[:k]:
+            if k >= 2 or k == len(words):
+                out.extend(words[k:])
+                return
+            break
+    out.extend(words)
+
+
+def parse_vtt(lines: Iterable[str]) -> str:
+    """Extract plain text from WebVTT lines in a single pass.
+
+    `lines` can be any iterable (e.g. an open file), so large caption files are
+    never held in memory as a whole.
+    """
+    out = []
+    previous = None
+    header = True  # before the first cue timing line
+    block_start = True
+    skip_block = False
+    for line in lines:
+        line = line.strip()
+        if not line:
+            block_start = True
+            skip_block = False
+            continue
+        if block_start:
+            block_start = False
+            keyword = line.split(None, 1)[0]
+            skip_block = keyword == "NOTE" or (header and keyword in _VTT_HEADER_BLOCKS)
+        # Fast path: rolling captions repeat the previous text line verbatim
+        if skip_block or line == previous:
+            continue
+        if "-->" in line:
+            header = False
+            continue
+        if line.isdigit() or (header and line.startswith(_VTT_HEADER_PREFIXES)):
+            continue
+        if "<" in line:
+            line = _TAG_RE.sub("", line)
+            if line == previous:
+                continue
+        previous = line
+        _append_words(out, line.split())
+    return " ".join(out)
+
+
+def parse_json3(data: str) -> str:
+    """Extract plain text from YouTube's json3 caption format."""
+    out = []
+    for event in json.loads(data).get("events", []):
+        segs = event.get("segs")
+        if segs:
+            _append_words(out, "".join(seg.get("utf8", "") for seg in segs).split())
+    return " ".join(out)
+
+
+def parse_srv3(data: str) -> str:
+    """Extract plain text from YouTube's srv3 (timedtext XML) caption format."""
+    out = []
+    for p in ET.fromstring(data).iter("p"):
+        _append_words(out, "".join(p.itertext()).split())
+    return " ".join(out)
+
+
+_PARSERS = {
+    "json3": parse_json3,
+    "srv3": parse_srv3,
+    "vtt": lambda data: parse_vtt(data.splitlines()),
+}
+
+CAPTION_FORMATS = tuple(_PARSERS)
+CAPTION_EXTENSIONS = tuple("." + fmt for fmt in CAPTION_FORMATS)
+
+
+def parse_captions(data: str, fmt: str) -> str:
+    """Extract plain text from caption data in one of CAPTION_FORMATS."""
+    return _PARSERS[fmt](data)
+
+
+def parse_caption_file(path: str) -> str:
+    """Extract plain text from a caption file, choosing the parser by extension."""
+    fmt = os.path.splitext(path)[1].lstrip(".").lower()
+    with open(path, "r", encoding="utf-8") as f:
+        if fmt == "vtt":
+            return parse_vtt(f)
+        return parse_captions(f.read(), fmt)
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import re
+
+from config import COMPACT_DROP_SPONSORS
+
+# Longest phrase (in words) checked for rolling-caption overlap
+MAX_REPEAT_WORDS = 16
+
+# Filler words dropped outright (compared lowercased, without punctuation)
+FILLER_WORDS = {"um", "umm", "uh", "uhh", "uhm", "erm", "er", "ah", "hmm", "mm", "mhm"}
+
+# Sponsor-read classifier: windows of this many words are scored by the
+# phrases below, and windows scoring SPONSOR_THRESHOLD or more are dropped
+SPONSOR_WINDOW_WORDS = 40
+SPONSOR_THRESHOLD = 3
+SPONSOR_PHRASES = {
+    "sponsor": 2,
+    "brought to you by": 2,
+    "promo code": 2,
+    "use code": 2,
+    "discount code": 2,
+    "affiliate link": 2,
+    "link in the description": 2,
+    "link down below": 2,
+    "first 100": 2,
+    "free trial": 2,
+    "percent off": 2,
+    "% off": 2,
+    "sign up": 1,
+    "check out": 1,
+    "free stock": 1,
+    "exclusive offer": 1,
+    "limited time": 1,
+    "download the app": 1,
+}
+
+# Caption annotations like [Music] or [Applause], and ">>" speaker-change marks
+_ANNOTATION_RE = re.compile(r"\[[^\]]*\]|>>")
+_PUNCTUATION = ".,!?;:\"'()-"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def _drop_repeats(words: list[str]) -> list[str]:
+    """Remove immediately repeated words and phrases ("the the", rolling-caption overlap).
+
+    A phrase of up to MAX_REPEAT_WORDS words that directly repeats the phrase before
+    it is dropped, ignoring case and punctuation.
+    """
+    out = []
+    norm = []
+    for word in words:
+        out.append(word)
+        norm.append(word.lower().strip(_PUNCTUATION))
+        size = len(norm)
+        for n in range(1, min(MAX_REPEAT_WORDS, size // 2) + 1):
+            # Cheap check on the last word before comparing whole phrases
+            if norm[-1] == norm[-1 - n] and norm[-n:] == norm[-2 * n:-n]:
+                del out[-n:]
+                del norm[-n:]
+                break
+    return out
+
+
+def _sponsor_score(words: list[str]) -> int:
+    window = " ".join(words).lower()
+    return sum(weight for phrase, weight in SPONSOR_PHRASES.items() if phrase in window)
+
+
+def _drop_sponsor_reads(words: list[str]) -> list[str]:
+    """Drop fixed-size windows that look like sponsor reads (plus gaps between two of them)."""
+    windows = [
+        words[i:i + SPONSOR_WINDOW_WORDS] for i in range(0, len(words), SPONSOR_WINDOW_WORDS)
+    ]
+    flagged = [_sponsor_score(w) >= SPONSOR_THRESHOLD for w in windows]
+    # A single unflagged window between two flagged ones is the middle of the same read
+    for i in range(1, len(windows) - 1):
+        if flagged[i - 1] and flagged[i + 1]:
+            flagged[i] = True
+    return [word for window, drop in zip(windows, flagged) if not drop for word in window]
+
+
+def compact_transcript(text: str, drop_sponsors: bool = COMPACT_DROP_SPONSORS) -> str:
+    """Deterministically shrink a caption transcript without changing what it says.
+
+    Removes caption annotations, filler words and repeated words/phrases, and
+    optionally sponsor reads.
+    """
+    words = [
+        w for w in _ANNOTATION_RE.sub(" ", text).split()
+        if w.lower().strip(_PUNCTUATION) not in FILLER_WORDS
+    ]
+    words = _drop_repeats(words)
+    if drop_sponsors:
+        words = _drop_sponsor_reads(words)
+    return " ".join(words)
+
+
+def compact_video(video: dict) -> dict:
+    """Compact a video's transcript in place, recording token counts before and after.
+
+    Description-only fallbacks are left alone.
+    """
+    transcript = video["transcript"]
+    if transcript.startswith("[VIDEO DESCRIPTION"):
+        return video
+
+    compacted = compact_transcript(transcript)
+    before = estimate_tokens(transcript)
+    after = estimate_tokens(compacted)
+    video["transcript"] = compacted
+    video["compaction"] = {"tokens_before": before, "tokens_after": after}
+    print(f"    Compacted {video['title']}: {before} -> {after} tokens (-{before - after})")
+    return video
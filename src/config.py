@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -12,6 +13,25 @@ GMAIL_ADDRESS = os.environ["GMAIL_ADDRESS"]
 GMAIL_APP_PASSWORD = os.environ["GMAIL_APP_PASSWORD"]
 RECIPIENT_EMAIL = os.environ.get("RECIPIENT_EMAIL", GMAIL_ADDRESS)
 
+# SMTP server. All digests of a run go over one connection, and a message is
+# retried up to SMTP_MAX_RETRIES times (reconnecting if needed) on temporary
+# failures. For a local test server: SMTP_HOST=localhost SMTP_PORT=8025
+# SMTP_STARTTLS=false SMTP_LOGIN=false with `python -m aiosmtpd -n -l localhost:8025`
+SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_LOGIN = os.environ.get("SMTP_LOGIN", "true").lower() == "true"
+SMTP_MAX_RETRIES = int(os.environ.get("SMTP_MAX_RETRIES", "3"))
+SMTP_TIMEOUT_SECONDS = float(os.environ.get("SMTP_TIMEOUT_SECONDS", "30"))
+
+# Recipient profiles (JSON, or the path of a JSON file). Each profile gets its own
+# digest, built from the same fetched transcripts and summaries:
+#   [{"name": "Crypto desk", "recipients": ["a@example.com"], "channels": ["ZipTrader"],
+#     "tickers": ["BTC", "ETH"]}]
+# "channels" (ids or names) and "tickers" are optional filters. Channel ids not in
+# CHANNEL_IDS are fetched too. Without profiles, one digest goes to RECIPIENT_EMAIL.
+RECIPIENT_PROFILES = os.environ.get("RECIPIENT_PROFILES", "")
+
 # YouTube channels to follow — add your channel IDs here
 # Find a channel ID: go to the channel page → View Page Source → search "channelId"
 # Or use https://www.youtube.com/@channelname and look at the page source
@@ -31,3 +51,109 @@ MAX_VIDEOS_PER_CHANNEL = int(os.environ.get("MAX_VIDEOS_PER_CHANNEL", "5"))
 
 # Claude model for summarization
 CLAUDE_MODEL = os.environ.get("CLAUDE_MODEL", "claude-sonnet-4-5-20250929")
+
+# Claude model for the overall digest
+DIGEST_MODEL = os.environ.get("DIGEST_MODEL", CLAUDE_MODEL)
+
+# Triage: before the full summary, a small model reads the start and end of the
+# transcript (TRIAGE_SAMPLE_TOKENS in total) and skips sponsored, off-topic and
+# low-information videos (reruns, re-uploads, "live soon" streams)
+TRIAGE_ENABLED = os.environ.get("TRIAGE_ENABLED", "true").lower() == "true"
+TRIAGE_MODEL = os.environ.get("TRIAGE_MODEL", "claude-haiku-4-5-20251001")
+TRIAGE_SAMPLE_TOKENS = int(os.environ.get("TRIAGE_SAMPLE_TOKENS", "1200"))
+
+# Per-call timeouts. Triage calls are small, so a stuck one is given up on quickly
+# (the video is then summarized as usual).
+TRIAGE_TIMEOUT_SECONDS = float(os.environ.get("TRIAGE_TIMEOUT_SECONDS", "30"))
+CLAUDE_TIMEOUT_SECONDS = float(os.environ.get("CLAUDE_TIMEOUT_SECONDS", "600"))
+
+# USD per million input and output tokens, by model id prefix, for the cost
+# report. Override or add models with JSON, e.g. MODEL_PRICES='{"claude-haiku-4-5": [1, 5]}'
+MODEL_PRICES = {
+    "claude-haiku-4-5": (1.0, 5.0),
+    "claude-sonnet-4-5": (3.0, 15.0),
+    "claude-opus-4-1": (15.0, 75.0),
+    **{model: tuple(prices) for model, prices in json.loads(os.environ.get("MODEL_PRICES", "{}")).items()},
+}
+
+# Transcript fetching — number of videos fetched in parallel, and the sustained
+# request rate allowed against youtube.com (shared by all workers)
+FETCH_CONCURRENCY = int(os.environ.get("FETCH_CONCURRENCY", "4"))
+YOUTUBE_REQUESTS_PER_SECOND = float(os.environ.get("YOUTUBE_REQUESTS_PER_SECOND", "0.5"))
+
+# Local cache for transcripts and other run-to-run state
+CACHE_DIR = os.environ.get("CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "youtube-digest"))
+
+# How long cached transcripts stay valid. "No transcript" results (and
+# description-only fallbacks) expire sooner, since captions often appear later.
+TRANSCRIPT_CACHE_TTL_HOURS = int(os.environ.get("TRANSCRIPT_CACHE_TTL_HOURS", "168"))
+TRANSCRIPT_NEGATIVE_TTL_HOURS = int(os.environ.get("TRANSCRIPT_NEGATIVE_TTL_HOURS", "6"))
+TRANSCRIPT_CACHE_MAX_MB = int(os.environ.get("TRANSCRIPT_CACHE_MAX_MB", "200"))
+
+# Video summaries are cached per (video, transcript, model, prompt). Bump the
+# prompt version to invalidate cached summaries after changing the prompt's intent.
+SUMMARY_PROMPT_VERSION = os.environ.get("SUMMARY_PROMPT_VERSION", "1")
+SUMMARY_CACHE_TTL_HOURS = int(os.environ.get("SUMMARY_CACHE_TTL_HOURS", "168"))
+
+# Claude calls — how many requests are in flight at once (across videos and the
+# chunks of long videos), and how many times a request is retried after a
+# transient error (rate limited, overloaded, 5xx, timeout or dropped connection)
+SUMMARY_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", "4"))
+CLAUDE_MAX_RETRIES = int(os.environ.get("CLAUDE_MAX_RETRIES", "5"))
+
+# Stream Claude's replies, so long replies don't run into HTTP read timeouts
+CLAUDE_STREAMING = os.environ.get("CLAUDE_STREAMING", "true").lower() == "true"
+
+# --batch mode: how long to wait for a message batch before falling back to
+# regular (synchronous) summarization
+BATCH_TIMEOUT_MINUTES = int(os.environ.get("BATCH_TIMEOUT_MINUTES", "120"))
+
+# How to find new videos:
+#   "search"  — search.list over the LOOKBACK_HOURS window (100 quota units per channel)
+#   "uploads" — read each channel's uploads playlist (1 unit per channel) and only
+#               return videos newer than the last ones already sent in a digest
+POLL_MODE = os.environ.get("POLL_MODE", "search")
+
+# Transcripts longer than this (estimated tokens) are summarized in chunks of
+# this size in parallel, then merged into one analysis
+SUMMARY_CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", "15000"))
+
+# When the video summaries are more than this many (estimated) tokens, the digest
+# is built from groups of channels of this size in parallel, then the partial
+# digests are merged (as many per call as fit in the same budget) until one is left
+DIGEST_CHUNK_TOKENS = int(os.environ.get("DIGEST_CHUNK_TOKENS", "20000"))
+
+# Near-duplicate detection: a video whose transcript is mostly (DEDUP_THRESHOLD)
+# contained in another video's, from this run or summarized in the last
+# DEDUP_HISTORY_HOURS (clips, shorts and re-uploads of a livestream), is linked to
+# that video's summary instead of being summarized again
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0.7"))
+DEDUP_HISTORY_HOURS = int(os.environ.get("DEDUP_HISTORY_HOURS", "168"))
+
+# Every analysis and digest is kept in a local history (python src/history.py
+# to query it). The digest is given each top ticker's latest HISTORY_CONTEXT_ROWS
+# mentions from the previous HISTORY_CONTEXT_DAYS days, and the last overview.
+HISTORY_ENABLED = os.environ.get("HISTORY_ENABLED", "true").lower() == "true"
+HISTORY_CONTEXT_DAYS = int(os.environ.get("HISTORY_CONTEXT_DAYS", "7"))
+HISTORY_CONTEXT_ROWS = int(os.environ.get("HISTORY_CONTEXT_ROWS", "4"))
+
+# Transcript compaction before summarization. Dropping sponsor reads is a
+# heuristic, so it is opt-in.
+COMPACT_TRANSCRIPTS = os.environ.get("COMPACT_TRANSCRIPTS", "true").lower() == "true"
+COMPACT_DROP_SPONSORS = os.environ.get("COMPACT_DROP_SPONSORS", "false").lower() == "true"
+
+# yt-dlp fallback: download caption tracks straight into memory with one reused
+# YoutubeDL per worker (false = let yt-dlp write subtitle files to a temp dir)
+YTDLP_IN_MEMORY = os.environ.get("YTDLP_IN_MEMORY", "true").lower() == "true"
+
+# Adaptive transcript layers: skip a caption layer after this many consecutive
+# failures (still probing it every LAYER_PROBE_EVERY videos), and when a layer's
+# p90 latency exceeds HEDGE_AFTER_SECONDS, start the next layer in parallel once
+# that much time has passed
+LAYER_SKIP_AFTER_FAILURES = int(os.environ.get("LAYER_SKIP_AFTER_FAILURES", "3"))
+LAYER_PROBE_EVERY = int(os.environ.get("LAYER_PROBE_EVERY", "5"))
+HEDGE_AFTER_SECONDS = float(os.environ.get("HEDGE_AFTER_SECONDS", "10"))
+
+# Machine-readable timing report written at the end of every run
+RUN_REPORT_PATH = os.environ.get("RUN_REPORT_PATH", os.path.join(CACHE_DIR, "run-report.json"))
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import re
+import threading
+import zlib
+from typing import Optional
+
+from cache import get_duplicate_history
+from config import DEDUP_THRESHOLD
+
+# Transcripts are compared as sets of overlapping 8-word shingles. Only shingles
+# whose hash is divisible by SAMPLE_EVERY are kept: the choice depends on the
+# content alone, so a clip keeps the same samples as the stretch of the
+# livestream it was cut from.
+SHINGLE_WORDS = 8
+SAMPLE_EVERY = 4
+
+# Transcripts with fewer samples than this (a minute or so of speech) are too
+# short to call duplicates reliably
+MIN_SAMPLES = 12
+
+# Text youtube_client uses when a video had no captions; descriptions share too
+# much boilerplate (links, disclaimers) to compare
+_DESCRIPTION_PREFIX = "[VIDEO DESCRIPTION"
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def sketch(text: str) -> set[int]:
+    """Sampled shingle hashes of a transcript (empty for description fallbacks)."""
+    if text.startswith(_DESCRIPTION_PREFIX):
+        return set()
+    words = _WORD_RE.findall(text.lower())
+    hashes = set()
+    for i in range(len(words) - SHINGLE_WORDS + 1):
+        h = zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"))
+        if h % SAMPLE_EVERY == 0:
+            hashes.add(h)
+    return hashes
+
+
+class DuplicateIndex:
+    """Finds videos whose transcript is mostly contained in an already seen one.
+
+    Containment (the share of a video's samples found in the other video) rather
+    than similarity, so that a short clip matches the full livestream. Videos are
+    checked against the canonical videos added earlier in this run, then against
+    the persisted history of summarized videos.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, history=None):
+        self.threshold = threshold
+        self._history = history if history is not None else get_duplicate_history()
+        self._sketches = {}  # video_id -> sketch, for every video seen
+        self._videos = {}  # video_id -> video, for canonical videos of this run
+        self._postings = {}  # hash -> [video_id], for canonical videos of this run
+        self._lock = threading.Lock()
+
+    def _sketch(self, video: dict) -> set[int]:
+        with self._lock:
+            samples = self._sketches.get(video["video_id"])
+        if samples is None:
+            samples = sketch(video["transcript"])
+            with self._lock:
+                self._sketches[video["video_id"]] = samples
+        return samples
+
+    def _shared_in_run(self, samples: set[int]) -> dict[str, int]:
+        counts = {}
+        for h in samples:
+            for video_id in self._postings.get(h, ()):
+                counts[video_id] = counts.get(video_id, 0) + 1
+        return counts
+
+    def find(self, video: dict) -> Optional[dict]:
+        """The video (from this run, else from history) that contains `video`, or None.
+
+        A history match also has its summary_key. The best match is the one
+        containing the largest share of the video.
+        """
+        samples = self._sketch(video)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        with self._lock:
+            in_run = [
+                (self._videos[video_id], count)
+                for video_id, count in self._shared_in_run(samples).items()
+                if video_id != video["video_id"]
+            ]
+        history = [
+            (match, count) for match, count in self._history.shared(samples)
+            if match["video_id"] != video["video_id"]
+        ]
+        for candidates in (in_run, history):
+            best = max(candidates, key=lambda c: c[1], default=None)
+            if best is not None and best[1] / len(samples) >= self.threshold:
+                return best[0]
+        return None
+
+    def add(self, video: dict) -> list[dict]:
+        """Index `video` as canonical for this run.
+
+        Returns this run's canonical videos that it contains (e.g. a clip that
+        arrived before its livestream); they are no longer canonical.
+        """
+        samples = self._sketch(video)
+        if len(samples) < MIN_SAMPLES:
+            return []
+        with self._lock:
+            contained = [
+                video_id for video_id, count in self._shared_in_run(samples).items()
+                if video_id != video["video_id"] and count / len(self._sketches[video_id]) >= self.threshold
+            ]
+            superseded = []
+            for video_id in contained:
+                for h in self._sketches[video_id]:
+                    self._postings[h].remove(video_id)
+                superseded.append(self._videos.pop(video_id))
+            self._videos[video["video_id"]] = video
+            for h in samples:
+                self._postings.setdefault(h, []).append(video["video_id"])
+        return superseded
+
+    def remember(self, video: dict, summary_key: str) -> None:
+        """Persist a summarized canonical video, so later runs can link to its summary."""
+        samples = self._sketch(video)
+        if len(samples) >= MIN_SAMPLES:
+            self._history.add(video, summary_key, samples)
@@ -0,0 +1,393 @@
+from __future__ import annotations
+
+import html
+from datetime import datetime, timezone
+from functools import lru_cache
+from string import Formatter
+from typing import Callable, Iterator, Optional
+
+SENTIMENT_COLORS = {
+    "bullish": "#16a34a",
+    "bearish": "#dc2626",
+    "neutral": "#6b7280",
+}
+
+NO_LEVELS = "No specific levels mentioned"
+
+
+def _literal(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _escape_all(texts: list[str], escape: Callable[[str], str] = html.escape) -> list[str]:
+    """escape() applied to each of `texts`, in a single call on the NUL-joined texts.
+
+    Escaping is most of the rendering time, and one call on a longer string is
+    much cheaper than one per value. Texts that contain NUL themselves are
+    escaped one by one.
+    """
+    parts = escape("\0".join(texts)).split("\0")
+    if len(parts) != len(texts):
+        return [escape(text) for text in texts]
+    return parts
+
+
+class Template:
+    """A template whose format string is prepared once.
+
+    `{name}` is replaced by the value of `name`, escaped; `{name!s}` by the value
+    as is, for markup rendered by another template. `{{` and `}}` are literal
+    braces. Fields given as `constants` (colors, headings) are filled in up
+    front. With escape=None (plain text) nothing is escaped.
+
+    render() takes every field as a keyword argument and is a single
+    str.format call on the prepared format string, with the escaped values.
+    """
+
+    __slots__ = ("render",)
+
+    def __init__(self, source: str, escape: Optional[Callable[[str], str]] = html.escape, **constants):
+        pieces = []
+        escaped = []
+        raw = []
+        for literal, name, spec, conversion in Formatter().parse(source):
+            pieces.append(_literal(literal))
+            if name is None:
+                continue
+            if spec or conversion not in (None, "s") or not name.isidentifier():
+                raise ValueError(f"Unsupported template field '{name}': only {{name}} and {{name!s}}")
+            escape_field = escape is not None and conversion is None
+            if name in constants:
+                value = str(constants[name])
+                pieces.append(_literal(escape(value) if escape_field else value))
+                continue
+            fields, others = (escaped, raw) if escape_field else (raw, escaped)
+            if name in others:
+                raise ValueError(f"Template field '{name}' is used both escaped and as is")
+            if name not in fields:
+                fields.append(name)
+            pieces.append("{" + name + "}")
+
+        fmt = "".join(pieces)
+        if not escaped and not raw:
+            text = fmt.format()
+            self.render: Callable[..., str] = lambda: text
+        elif not escaped:
+            self.render = fmt.format
+        elif len(escaped) == 1:
+            (name,) = escaped
+
+            def render(**values) -> str:
+                values[name] = escape(str(values[name]))
+                return fmt.format(**values)
+
+            self.render = render
+        else:
+            def render(**values) -> str:
+                values.update(zip(escaped, _escape_all([str(values[name]) for name in escaped], escape)))
+                return fmt.format(**values)
+
+            self.render = render
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%A, %B %d, %Y")
+
+
+def _levels(ticker: dict) -> str:
+    levels = ticker.get("price_levels", "")
+    return "" if levels == NO_LEVELS else levels
+
+
+def _thesis(ticker: dict) -> str:
+    # Old-format analyses have "context" instead
+    return ticker.get("thesis") or ticker.get("context", "")
+
+
+# ---------------------------------------------------------------------------
+# HTML
+# ---------------------------------------------------------------------------
+
+def _html_items(items) -> str:
+    """`items` as escaped <li> elements."""
+    return "<li>" + "</li><li>".join(_escape_all(list(items))) + "</li>" if items else ""
+
+
+_BADGE = Template(
+    '<span style="display:inline-block;padding:2px 8px;margin:2px;border-radius:4px;background:{color};'
+    'color:#fff;font-size:13px;font-weight:600;">{symbol} {sentiment}</span>'
+)
+
+_HEADER = Template("""<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><meta name="viewport" content="width=device-width,initial-scale=1.0"></head>
+<body style="margin:0;padding:0;background:#f3f4f6;font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,sans-serif;">
+<div style="max-width:640px;margin:0 auto;padding:20px;">
+
+  <div style="text-align:center;padding:24px 0;">
+    <h1 style="margin:0;font-size:22px;color:#111827;">Market Digest</h1>
+    <p style="margin:4px 0 0;font-size:14px;color:#6b7280;">{today} &middot; {count} video(s) analyzed</p>
+  </div>
+
+  <div style="background:linear-gradient(135deg,#1e293b,#334155);border-radius:10px;padding:24px;color:#fff;margin-bottom:20px;">
+    <h2 style="margin:0 0 12px;font-size:17px;color:#f1f5f9;">Today's Overview</h2>
+    <p style="margin:0 0 16px;font-size:14px;line-height:1.7;color:#e2e8f0;">{overview}</p>
+""")
+
+_OVERVIEW_LIST = """\
+    <div style="margin-top:14px;"><strong style="font-size:13px;color:#94a3b8;">{heading}</strong>\
+<ul style="margin:6px 0 0;padding-left:20px;color:{color};font-size:13px;line-height:1.7;">{items!s}</ul></div>
+"""
+
+# (digest field, template) for the lists inside the overview box
+_OVERVIEW_LISTS = (
+    ("consensus_themes", Template(_OVERVIEW_LIST, heading="CONSENSUS THEMES", color="#e2e8f0")),
+    ("conflicting_views", Template(_OVERVIEW_LIST, heading="CONFLICTING VIEWS", color="#fbbf24")),
+)
+
+_TOP_TICKER = Template('{badge!s} <span style="font-size:12px;color:#6b7280;">({count}x) {summary}</span><br>')
+
+_BOX = """\
+  <div style="background:{background};border:1px solid {border};border-radius:8px;padding:18px;margin-bottom:20px;">
+    <h3 style="margin:0 0 8px;font-size:15px;color:{color};">{heading}</h3>
+    <{list} style="margin:0;padding-left:20px;color:{color};font-size:14px;line-height:1.8;">{items!s}</{list}>
+  </div>
+"""
+
+# (digest field, heading, template) for the boxes below the overview
+_BOXES = tuple(
+    (field, heading, Template(_BOX, heading=heading, list=tag, background=background, border=border, color=color))
+    for field, heading, tag, background, border, color in (
+        ("key_levels_to_watch", "Key Levels to Watch", "ul", "#eff6ff", "#bfdbfe", "#1e40af"),
+        ("upcoming_catalysts", "Upcoming Catalysts", "ul", "#fefce8", "#fde68a", "#92400e"),
+        ("action_items", "Top Action Items", "ol", "#ecfdf5", "#a7f3d0", "#065f46"),
+        ("risk_alerts", "Risk Alerts", "ul", "#fef2f2", "#fecaca", "#991b1b"),
+    )
+)
+
+# A video card's text is escaped in one go (see render_video_card), so the card
+# templates take every value as is
+_CARD = Template("""\
+<div style="background:#fff;border:1px solid #e5e7eb;border-radius:8px;padding:20px;margin-bottom:16px;">
+  <div style="margin-bottom:4px;font-size:12px;color:#6b7280;text-transform:uppercase;letter-spacing:0.5px;">{channel!s}</div>
+  <a href="{url!s}" style="font-size:17px;font-weight:700;color:#111827;text-decoration:none;">{title!s}</a>
+  <p style="color:#374151;margin:12px 0;font-size:14px;line-height:1.6;">{summary!s}</p>
+{tickers!s}{sections!s}</div>
+""")
+
+# Pieces of a ticker line in a card, joined around the escaped levels and thesis
+_CARD_TICKER = '    <div style="margin-bottom:8px;">\n      '
+_CARD_LEVELS = '\n      <div style="font-size:12px;color:#374151;margin:4px 0 0 4px;"><strong>Levels:</strong> '
+_CARD_THESIS = '      <div style="font-size:12px;color:#6b7280;margin:2px 0 0 4px;">'
+
+_CARD_CLAIMS = Template("""\
+  <div style="margin-top:12px;background:#f8fafc;border-left:3px solid #3b82f6;padding:12px 16px;border-radius:0 6px 6px 0;">
+    <strong style="font-size:13px;color:#1e40af;">Key Claims</strong>
+    <ul style="margin:6px 0 0;padding-left:18px;color:#374151;font-size:13px;line-height:1.8;">{items!s}</ul>
+  </div>
+""")
+
+_CARD_LIST = """\
+  <div style="margin-top:10px;">
+    <strong style="font-size:13px;color:{color};">{heading}</strong>
+    <ul style="margin:4px 0 0;padding-left:18px;color:{color};font-size:13px;line-height:1.8;">{items!s}</ul>
+  </div>
+"""
+
+_CARD_TRADES = Template(_CARD_LIST, heading="Trade Ideas", color="#065f46")
+_CARD_RISKS = Template(_CARD_LIST, heading="Risks", color="#991b1b")
+_CARD_INSIGHTS = Template(_CARD_LIST, heading="Key Insights", color="#374151")
+_CARD_ACTIONS = Template(_CARD_LIST, heading="Action Items", color="#374151")
+
+_FOOTER = """\
+  <div style="text-align:center;padding:20px 0;font-size:12px;color:#9ca3af;">
+    Generated by YouTube Market Digest
+  </div>
+
+</div>
+</body>
+</html>
+"""
+
+
+@lru_cache(maxsize=1024)
+def _badge_html(symbol: str, sentiment: str) -> str:
+    return _BADGE.render(
+        color=SENTIMENT_COLORS.get(sentiment, SENTIMENT_COLORS["neutral"]),
+        symbol=symbol,
+        sentiment=sentiment.upper(),
+    )
+
+
+def _badge(ticker: dict) -> str:
+    # The same few tickers come up in most videos
+    return _badge_html(ticker.get("symbol", "???"), ticker.get("sentiment", "neutral"))
+
+
+def render_video_card(video: dict) -> str:
+    a = video.get("analysis", {})
+    tickers = a.get("tickers", [])
+    claims = a.get("key_claims", [])
+    trades = a.get("trade_ideas", [])
+    sections = [
+        (template, items)
+        for template, items in (
+            (_CARD_CLAIMS, claims),
+            (_CARD_TRADES, trades),
+            (_CARD_RISKS, a.get("risks_and_warnings", [])),
+            # Old-format analyses
+            (_CARD_INSIGHTS, [] if claims else a.get("market_insights", [])),
+            (_CARD_ACTIONS, [] if trades else a.get("action_items", [])),
+        )
+        if items
+    ]
+
+    # Escape all of the card's text at once: channel, url, title, summary, then
+    # levels and thesis per ticker, then the section items
+    texts = [
+        video.get("channel", ""),
+        video.get("url", "#"),
+        video.get("title", "Untitled"),
+        a.get("summary", "No summary available."),
+    ]
+    for ticker in tickers:
+        texts.append(_levels(ticker))
+        texts.append(_thesis(ticker))
+    for _, items in sections:
+        texts.extend(items)
+    escaped = _escape_all(texts)
+
+    ticker_html = []
+    for i, ticker in enumerate(tickers):
+        levels = escaped[4 + 2 * i]
+        thesis = escaped[5 + 2 * i]
+        ticker_html.append(
+            _CARD_TICKER + _badge(ticker)
+            + (_CARD_LEVELS + levels + "</div>\n" if levels else "\n")
+            + (_CARD_THESIS + thesis + "</div>\n" if thesis else "")
+            + "    </div>\n"
+        )
+    section_html = []
+    start = 4 + 2 * len(tickers)
+    for template, items in sections:
+        end = start + len(items)
+        section_html.append(template.render(items="<li>" + "</li><li>".join(escaped[start:end]) + "</li>"))
+        start = end
+
+    return _CARD.render(
+        channel=escaped[0],
+        url=escaped[1],
+        title=escaped[2],
+        summary=escaped[3],
+        tickers='  <div style="margin:10px 0;">\n' + "".join(ticker_html) + "  </div>\n" if tickers else "",
+        sections="".join(section_html),
+    )
+
+
+def iter_email_html(digest: dict, videos: list[dict]) -> Iterator[str]:
+    """The digest email as HTML, in chunks: the digest sections, then a card per video."""
+    yield _HEADER.render(
+        today=_today(),
+        count=len(videos),
+        overview=digest.get("market_overview", "No videos found for today."),
+    )
+    for field, template in _OVERVIEW_LISTS:
+        if digest.get(field):
+            yield template.render(items=_html_items(digest[field]))
+    if digest.get("top_tickers"):
+        yield '    <div style="margin-top:14px;">' + "".join([
+            _TOP_TICKER.render(badge=_badge(t), count=t.get("mention_count", 1), summary=t.get("summary", ""))
+            for t in digest["top_tickers"]
+        ]) + "</div>\n"
+    yield "  </div>\n"
+
+    for field, _, template in _BOXES:
+        if digest.get(field):
+            yield template.render(items=_html_items(digest[field]))
+
+    yield '  <h2 style="font-size:17px;color:#111827;margin:24px 0 12px;">Video Breakdowns</h2>\n'
+    for video in videos:
+        yield render_video_card(video)
+    yield _FOOTER
+
+
+def build_email_html(digest: dict, videos: list[dict]) -> str:
+    return "".join(iter_email_html(digest, videos))
+
+
+# ---------------------------------------------------------------------------
+# Plain text
+# ---------------------------------------------------------------------------
+
+_TEXT_HEADER = Template("MARKET DIGEST - {today}\n{count} video(s) analyzed\n\nTODAY'S OVERVIEW\n{overview}\n", escape=None)
+
+_TEXT_TOP_TICKER = Template("  - {symbol} {sentiment} ({count}x) {summary}\n", escape=None)
+
+_TEXT_CARD = Template("\n{channel}: {title}\n{url}\n{summary}\n{tickers}{sections}", escape=None)
+
+_TEXT_CARD_TICKER = Template("  {symbol} {sentiment}{levels}{thesis}\n", escape=None)
+
+_TEXT_RULE = "=" * 60
+
+
+def _text_section(heading: str, items) -> str:
+    return "\n" + heading + "\n" + "".join(["  - " + item + "\n" for item in items]) if items else ""
+
+
+def _text_ticker(ticker: dict) -> str:
+    levels = _levels(ticker)
+    thesis = _thesis(ticker)
+    return _TEXT_CARD_TICKER.render(
+        symbol=ticker.get("symbol", "???"),
+        sentiment=ticker.get("sentiment", "neutral").upper(),
+        levels=" | " + levels if levels else "",
+        thesis=" | " + thesis if thesis else "",
+    )
+
+
+def render_video_text(video: dict) -> str:
+    a = video.get("analysis", {})
+    claims = a.get("key_claims", [])
+    trades = a.get("trade_ideas", [])
+    return _TEXT_CARD.render(
+        channel=video.get("channel", ""),
+        title=video.get("title", "Untitled"),
+        url=video.get("url", ""),
+        summary=a.get("summary", "No summary available."),
+        tickers="".join([_text_ticker(t) for t in a.get("tickers", [])]),
+        sections=(
+            _text_section("Key claims:", claims)
+            + _text_section("Trade ideas:", trades)
+            + _text_section("Risks:", a.get("risks_and_warnings", []))
+            + _text_section("Key insights:", [] if claims else a.get("market_insights", []))
+            + _text_section("Action items:", [] if trades else a.get("action_items", []))
+        ),
+    )
+
+
+def iter_email_text(digest: dict, videos: list[dict]) -> Iterator[str]:
+    """The plain-text alternative of iter_email_html, in chunks."""
+    yield _TEXT_HEADER.render(
+        today=_today(),
+        count=len(videos),
+        overview=digest.get("market_overview", "No videos found for today."),
+    )
+    yield _text_section("CONSENSUS THEMES", digest.get("consensus_themes"))
+    yield _text_section("CONFLICTING VIEWS", digest.get("conflicting_views"))
+    if digest.get("top_tickers"):
+        yield "\nTOP TICKERS\n" + "".join([
+            _TEXT_TOP_TICKER.render(
+                symbol=t.get("symbol", "???"),
+                sentiment=t.get("sentiment", "neutral").upper(),
+                count=t.get("mention_count", 1),
+                summary=t.get("summary", ""),
+            )
+            for t in digest["top_tickers"]
+        ])
+    for field, heading, _ in _BOXES:
+        yield _text_section(heading.upper(), digest.get(field))
+
+    yield f"\n{_TEXT_RULE}\nVIDEO BREAKDOWNS\n{_TEXT_RULE}\n"
+    for video in videos:
+        yield render_video_text(video)
+    yield "\n--\nGenerated by YouTube Market Digest\n"
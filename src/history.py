@@ -0,0 +1,373 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from aggregator import format_price, normalize_symbol, parse_levels
+from cache import connect, shared_instance
+from profiles import DEFAULT_PROFILE
+
+# Analysis lists that are searchable, with the kind each is stored as
+CLAIM_FIELDS = (
+    ("key_claims", "claim"),
+    ("trade_ideas", "trade_idea"),
+    ("risks_and_warnings", "risk"),
+)
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _since(days: Optional[int]) -> str:
+    """First date (YYYY-MM-DD) of a window of `days` days ending today; "" for no limit."""
+    if days is None:
+        return ""
+    return (datetime.now(timezone.utc).date() - timedelta(days=days)).isoformat()
+
+
+def _fts_query(text: str) -> str:
+    """A user's search words as an FTS5 query: every word must match, taken literally."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+class AnalysisHistory:
+    """Every video analysis and digest sent, queryable across runs.
+
+    Tickers and their parsed price levels are indexed on (symbol, date); key
+    claims, trade ideas and risks are full-text searchable (FTS5 when SQLite has
+    it, LIKE otherwise). Dates are the videos' publication dates (UTC).
+    """
+
+    def __init__(self, filename: str = "history.sqlite3"):
+        self._lock = threading.Lock()
+        self._conn = connect(filename)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS analyses (
+                video_id  TEXT PRIMARY KEY,
+                date      TEXT NOT NULL,
+                channel   TEXT NOT NULL,
+                title     TEXT NOT NULL,
+                url       TEXT,
+                summary   TEXT NOT NULL,
+                analysis  TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS analyses_date ON analyses (date);
+
+            CREATE TABLE IF NOT EXISTS tickers (
+                video_id     TEXT NOT NULL,
+                symbol       TEXT NOT NULL,
+                date         TEXT NOT NULL,
+                channel      TEXT NOT NULL,
+                sentiment    TEXT NOT NULL,
+                price_levels TEXT NOT NULL,
+                thesis       TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tickers_symbol_date ON tickers (symbol, date);
+            CREATE INDEX IF NOT EXISTS tickers_video_id ON tickers (video_id);
+
+            CREATE TABLE IF NOT EXISTS levels (
+                video_id TEXT NOT NULL,
+                symbol   TEXT NOT NULL,
+                date     TEXT NOT NULL,
+                channel  TEXT NOT NULL,
+                kind     TEXT NOT NULL,
+                price    REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS levels_symbol_date ON levels (symbol, date);
+            CREATE INDEX IF NOT EXISTS levels_video_id ON levels (video_id);
+
+            CREATE TABLE IF NOT EXISTS claims (
+                id       INTEGER PRIMARY KEY,
+                video_id TEXT NOT NULL,
+                date     TEXT NOT NULL,
+                channel  TEXT NOT NULL,
+                kind     TEXT NOT NULL,
+                text     TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS claims_video_id ON claims (video_id);
+            CREATE INDEX IF NOT EXISTS claims_date ON claims (date);
+
+            CREATE TABLE IF NOT EXISTS digests (
+                id         INTEGER PRIMARY KEY,
+                date       TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                digest     TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS digests_date ON digests (date);
+            """
+        )
+        try:
+            # Added with recipient profiles; earlier digests belong to the default one
+            self._conn.execute(
+                f"ALTER TABLE digests ADD COLUMN profile TEXT NOT NULL DEFAULT '{DEFAULT_PROFILE}'"
+            )
+        except sqlite3.OperationalError:
+            pass  # already there
+        try:
+            # Rowids are claims.id
+            self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS claims_fts USING fts5 (text)")
+            self.fts = True
+        except sqlite3.OperationalError:
+            print("SQLite has no FTS5, history search falls back to LIKE")
+            self.fts = False
+
+    def _query(self, sql: str, params=()) -> list[dict]:
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    # -- Writing --------------------------------------------------------------
+
+    def _delete_video(self, video_id: str) -> None:
+        if self.fts:
+            self._conn.execute(
+                "DELETE FROM claims_fts WHERE rowid IN (SELECT id FROM claims WHERE video_id = ?)", (video_id,)
+            )
+        for table in ("analyses", "tickers", "levels", "claims"):
+            self._conn.execute(f"DELETE FROM {table} WHERE video_id = ?", (video_id,))
+
+    def _insert_video(self, video: dict) -> None:
+        analysis = video["analysis"]
+        video_id = video["video_id"]
+        day = (video.get("published_at") or _today())[:10]
+        channel = video["channel"]
+        self._conn.execute(
+            "INSERT INTO analyses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (video_id, day, channel, video["title"], video.get("url"), analysis.get("summary", ""),
+             json.dumps(analysis), time.time()),
+        )
+
+        seen = set()
+        for ticker in analysis.get("tickers", []):
+            symbol = normalize_symbol(ticker.get("symbol", ""))
+            if symbol is None or symbol in seen:
+                continue
+            seen.add(symbol)
+            price_levels = ticker.get("price_levels") or ""
+            self._conn.execute(
+                "INSERT INTO tickers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (video_id, symbol, day, channel, ticker.get("sentiment") or "neutral", price_levels,
+                 ticker.get("thesis") or ""),
+            )
+            self._conn.executemany(
+                "INSERT INTO levels VALUES (?, ?, ?, ?, ?, ?)",
+                [(video_id, symbol, day, channel, kind, price) for kind, price in parse_levels(price_levels)],
+            )
+
+        for field, kind in CLAIM_FIELDS:
+            for text in analysis.get(field, []):
+                cursor = self._conn.execute(
+                    "INSERT INTO claims (video_id, date, channel, kind, text) VALUES (?, ?, ?, ?, ?)",
+                    (video_id, day, channel, kind, text),
+                )
+                if self.fts:
+                    self._conn.execute(
+                        "INSERT INTO claims_fts (rowid, text) VALUES (?, ?)", (cursor.lastrowid, text)
+                    )
+
+    def store_analyses(self, videos: list[dict]) -> None:
+        """Store (or replace) the analysis of each video, in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for video in videos:
+                    self._delete_video(video["video_id"])
+                    self._insert_video(video)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def store_digest(self, digest: dict, day: Optional[str] = None, profile: str = DEFAULT_PROFILE) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO digests (date, created_at, digest, profile) VALUES (?, ?, ?, ?)",
+                (day or _today(), time.time(), json.dumps(digest), profile),
+            )
+
+    # -- Queries --------------------------------------------------------------
+
+    def levels(self, symbol: str, days: Optional[int] = 30, channel: Optional[str] = None) -> list[dict]:
+        """Parsed price levels for a symbol, newest first: date, channel, kind, price, title."""
+        sql = (
+            "SELECT l.date, l.channel, l.kind, l.price, a.title, l.video_id FROM levels l "
+            "JOIN analyses a USING (video_id) WHERE l.symbol = ? AND l.date >= ?"
+        )
+        params = [normalize_symbol(symbol), _since(days)]
+        if channel:
+            sql += " AND l.channel = ?"
+            params.append(channel)
+        return self._query(sql + " ORDER BY l.date DESC, l.channel, l.price", params)
+
+    def mentions(self, symbol: str, days: Optional[int] = 30, channel: Optional[str] = None) -> list[dict]:
+        """Every mention of a symbol, newest first: date, channel, sentiment, price_levels, thesis, title."""
+        sql = (
+            "SELECT t.date, t.channel, t.sentiment, t.price_levels, t.thesis, a.title, t.video_id "
+            "FROM tickers t JOIN analyses a USING (video_id) WHERE t.symbol = ? AND t.date >= ?"
+        )
+        params = [normalize_symbol(symbol), _since(days)]
+        if channel:
+            sql += " AND t.channel = ?"
+            params.append(channel)
+        return self._query(sql + " ORDER BY t.date DESC, t.channel", params)
+
+    def search(self, text: str, days: Optional[int] = None, limit: int = 50) -> list[dict]:
+        """Claims, trade ideas and risks containing every word of `text`: date, channel,
+        kind, text, title. Best matches first with FTS5, newest first otherwise."""
+        if not text.split():
+            return []
+        if self.fts:
+            sql = (
+                "SELECT c.date, c.channel, c.kind, c.text, a.title, c.video_id FROM claims_fts "
+                "JOIN claims c ON c.id = claims_fts.rowid JOIN analyses a USING (video_id) "
+                "WHERE claims_fts MATCH ? AND c.date >= ? ORDER BY claims_fts.rank LIMIT ?"
+            )
+            return self._query(sql, (_fts_query(text), _since(days), limit))
+
+        words = text.split()
+        sql = (
+            "SELECT c.date, c.channel, c.kind, c.text, a.title, c.video_id FROM claims c "
+            "JOIN analyses a USING (video_id) WHERE c.date >= ?"
+            + " AND c.text LIKE ? ESCAPE '\\'" * len(words)
+            + " ORDER BY c.date DESC LIMIT ?"
+        )
+        patterns = [
+            "%" + w.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%" for w in words
+        ]
+        return self._query(sql, [_since(days), *patterns, limit])
+
+    def latest_digest(self, before: Optional[str] = None, profile: str = DEFAULT_PROFILE) -> Optional[dict]:
+        """A profile's most recent digest (dated before `before`, if given), with its date."""
+        rows = self._query(
+            "SELECT date, digest FROM digests WHERE profile = ? AND date < ? ORDER BY created_at DESC LIMIT 1",
+            (profile, before or "9999"),
+        )
+        if not rows:
+            return None
+        return {"date": rows[0]["date"], **json.loads(rows[0]["digest"])}
+
+    def prior_context(self, symbols: list[str], days: int, rows: int, exclude: set[str] = frozenset(),
+                      profile: str = DEFAULT_PROFILE) -> dict:
+        """Compact earlier context for the digest prompt.
+
+        Per symbol, its latest `rows` mentions from the last `days` days (date,
+        channel, sentiment, levels), leaving out the videos in `exclude`; plus the
+        profile's previous market overview. Empty when there is no history.
+        """
+        context = {}
+        for symbol in symbols:
+            mentions = [m for m in self.mentions(symbol, days) if m["video_id"] not in exclude][:rows]
+            if mentions:
+                context.setdefault("tickers", {})[symbol] = [
+                    {"date": m["date"], "channel": m["channel"], "sentiment": m["sentiment"],
+                     "levels": m["price_levels"]}
+                    for m in mentions
+                ]
+        previous = self.latest_digest(before=_today(), profile=profile)
+        if previous is not None and previous.get("market_overview"):
+            context["previous_overview"] = {"date": previous["date"], "text": previous["market_overview"]}
+        return context
+
+
+@shared_instance
+def get_history() -> AnalysisHistory:
+    """Process-wide analysis history, opened on first use."""
+    return AnalysisHistory()
+
+
+# ---------------------------------------------------------------------------
+# Command line
+# ---------------------------------------------------------------------------
+
+def _print_levels(symbol: str, rows: list[dict], days: Optional[int]) -> None:
+    window = f"last {days} days" if days is not None else "all time"
+    print(f"{normalize_symbol(symbol)} levels, {window}: {len(rows)}")
+    by_channel = {}
+    for row in rows:
+        by_channel.setdefault(row["channel"], []).append(row)
+    for channel, channel_rows in sorted(by_channel.items()):
+        print(f"\n  {channel}")
+        for row in channel_rows:
+            print(f"    {row['date']}  {row['kind']:<10} {format_price(row['price']):>12}  {row['title']}")
+
+
+def _print_mentions(symbol: str, rows: list[dict], days: Optional[int]) -> None:
+    window = f"last {days} days" if days is not None else "all time"
+    print(f"{normalize_symbol(symbol)} mentions, {window}: {len(rows)}")
+    for row in rows:
+        print(f"\n  {row['date']}  {row['channel']} ({row['sentiment']}): {row['title']}")
+        if row["price_levels"]:
+            print(f"    Levels: {row['price_levels']}")
+        if row["thesis"]:
+            print(f"    Thesis: {row['thesis']}")
+
+
+def _print_claims(rows: list[dict]) -> None:
+    for row in rows:
+        print(f"  {row['date']}  {row['channel']} [{row['kind']}]: {row['text']}")
+    print(f"{len(rows)} result(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the history of video analyses and digests.")
+    parser.add_argument("--json", action="store_true", help="Print the raw rows as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("levels", "Price levels mentioned for a ticker, by channel"),
+                            ("mentions", "Every mention of a ticker, with sentiment and thesis")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("symbol")
+        command.add_argument("--days", type=int, default=30, help="Look back this many days (default 30)")
+        command.add_argument("--channel", help="Only this channel")
+
+    search = commands.add_parser("search", help="Full-text search over key claims, trade ideas and risks")
+    search.add_argument("text")
+    search.add_argument("--days", type=int, help="Look back this many days (default: all)")
+    search.add_argument("--limit", type=int, default=50)
+
+    digest = commands.add_parser("digest", help="The latest digest (or the latest before a date)")
+    digest.add_argument("--before", metavar="YYYY-MM-DD")
+    digest.add_argument("--profile", default=DEFAULT_PROFILE, help="Recipient profile name")
+
+    args = parser.parse_args()
+    history = get_history()
+
+    start = time.perf_counter()
+    if args.command == "levels":
+        rows = history.levels(args.symbol, args.days, args.channel)
+    elif args.command == "mentions":
+        rows = history.mentions(args.symbol, args.days, args.channel)
+    elif args.command == "search":
+        rows = history.search(args.text, args.days, args.limit)
+    else:
+        before = (date.fromisoformat(args.before) + timedelta(days=1)).isoformat() if args.before else None
+        rows = history.latest_digest(before, args.profile)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    if args.command == "levels":
+        _print_levels(args.symbol, rows, args.days)
+    elif args.command == "mentions":
+        _print_mentions(args.symbol, rows, args.days)
+    elif args.command == "search":
+        _print_claims(rows)
+    elif rows is None:
+        print("No digest stored yet")
+    else:
+        print(json.dumps(rows, indent=2))
+    print(f"({elapsed * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,156 @@
+import argparse
 import sys
 
-from config import CHANNEL_IDS
-from youtube_client import fetch_videos_with_transcripts
-from summarizer import summarize_video, generate_overall_digest
-from email_sender import send_digest_email
+from cache import get_summary_cache
+from compactor import compact_video
+from config import CHANNEL_IDS, COMPACT_TRANSCRIPTS, HISTORY_ENABLED
+from history import get_history
+from profiles import filter_digest, load_profiles, profile_channel_ids, select_videos
+from youtube_client import enrich_videos, get_new_videos, iter_videos_with_transcripts, mark_videos_seen
+from summarizer import summarize_videos, summarize_videos_batch, generate_overall_digest, usage
+from email_sender import send_digest_emails
+from telemetry import span, write_report
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Email a digest of new YouTube market videos.")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Summarize videos through the Message Batches API (cheaper, slower)",
+    )
+    args = parser.parse_args()
+
     if not CHANNEL_IDS:
         print("No channels configured. Add channel IDs to src/config.py")
         sys.exit(1)
 
-    print(f"Checking {len(CHANNEL_IDS)} channel(s) for new videos...")
+    try:
+        with span("run", batch=args.batch) as run:
+            try:
+                run_digest(batch=args.batch)
+            finally:
+                run.set(claude_stages=usage.by_stage())
+    finally:
+        write_report()
+
 
-    # 1. Fetch new videos with transcripts
-    videos = fetch_videos_with_transcripts(CHANNEL_IDS)
+def run_digest(batch: bool = False):
+    """Find new videos, summarize them and email each recipient profile its digest."""
+    profiles = load_profiles()
+    channel_ids = profile_channel_ids(profiles)
+    print(f"Checking {len(channel_ids)} channel(s) for new videos...")
+
+    # 1. Find new videos
+    found = get_new_videos(channel_ids)
+    videos = enrich_videos(found)
+    print(f"Found {len(videos)} new video(s) across {len(channel_ids)} channel(s)")
 
     if not videos:
-        print("No new videos with transcripts found. Skipping digest.")
+        print("No new videos found. Skipping digest.")
+        return
+
+    # 2. Fetch transcripts and summarize each video with Claude. Normally each
+    # video is summarized as soon as its transcript arrives; batch mode needs
+    # every transcript up front.
+    print(f"\nFetching transcripts and summarizing with Claude...")
+    with span("pipeline", videos=len(videos)):
+        fetched = iter_videos_with_transcripts(videos)
+        if COMPACT_TRANSCRIPTS:
+            fetched = (compact_video(v) for v in fetched)
+        if batch:
+            results = summarize_videos_batch(list(fetched))
+        else:
+            results = summarize_videos(fetched)
+
+    if not results:
+        print("No videos with transcripts could be summarized. Skipping digest.")
         return
 
-    # 2. Summarize each video
-    print(f"\nSummarizing {len(videos)} video(s) with Claude...")
+    # Restore the channel/date order from get_new_videos
+    order = {v["video_id"]: i for i, v in enumerate(videos)}
+    results.sort(key=lambda r: order[r["video_id"]])
+
     analyzed = []
-    for video in videos:
-        print(f"  Analyzing: {video['title']}")
-        result = summarize_video(video)
+    for result in results:
+        # Clips and re-uploads share the summary of the video they duplicate
+        duplicate_of = result.get("duplicate_of")
+        if duplicate_of:
+            print(f"  ** SKIPPED (duplicate of {duplicate_of['channel']}: {duplicate_of['title']}): "
+                  f"{result['channel']}: {result['title']}")
+            continue
+
+        # Drop videos triage ruled out (sponsored, off-topic, low-information)
+        triage = result.get("triage")
+        if triage and triage["verdict"] != "keep":
+            print(f"  ** SKIPPED ({triage['verdict']}): {result['channel']}: {result['title']}")
+            continue
 
         # Drop fully sponsored videos
         if result.get("analysis", {}).get("is_sponsored", False):
-            print(f"  ** SKIPPED (sponsored): {video['channel']}: {video['title']}")
+            print(f"  ** SKIPPED (sponsored): {result['channel']}: {result['title']}")
             continue
 
         analyzed.append(result)
 
+    cache = get_summary_cache()
+    print(f"Summary cache: {cache.hits} hit(s), {cache.misses} miss(es)")
+    if COMPACT_TRANSCRIPTS:
+        saved = sum(
+            r["compaction"]["tokens_before"] - r["compaction"]["tokens_after"]
+            for r in results
+            if "compaction" in r
+        )
+        print(f"Transcript compaction saved ~{saved} input token(s)")
+
     if not analyzed:
-        print("All videos were sponsored or empty. Skipping digest.")
+        print("All videos were skipped, sponsored or empty. Skipping digest.")
         return
 
-    # 3. Generate overall digest
-    print(f"\nGenerating overall market digest from {len(analyzed)} video(s)...")
-    digest = generate_overall_digest(analyzed)
+    # 3. Keep the analyses for later queries and digests
+    if HISTORY_ENABLED:
+        with span("history.store", videos=len(analyzed)):
+            get_history().store_analyses(analyzed)
+
+    # 4. Generate a digest per recipient profile. Profiles that receive the same
+    # videos share one digest call, unless the history gives each profile its
+    # own context (its last overview).
+    deliveries = []
+    digests = {}  # (tuple of video ids, profile name or None) -> digest
+    for profile in profiles:
+        selected = select_videos(profile, analyzed)
+        if not selected:
+            print(f"\nNo videos for profile '{profile['name']}'. Skipping its digest.")
+            continue
+
+        key = (tuple(v["video_id"] for v in selected), profile["name"] if HISTORY_ENABLED else None)
+        if key not in digests:
+            print(f"\nGenerating market digest for '{profile['name']}' from {len(selected)} video(s)...")
+            with span("digest", videos=len(selected), profile=profile["name"]):
+                digests[key] = generate_overall_digest(selected, profile=profile["name"])
+        deliveries.append((profile, filter_digest(profile, digests[key]), selected))
+
+    # 5. Send the emails, all over one SMTP connection. Videos that only went to
+    # profiles whose email failed are not marked seen, so the next run retries them,
+    # and only the digests that were sent are kept as the profiles' last digest.
+    failed = {}
+    if deliveries:
+        print(f"\nSending {len(deliveries)} digest email(s)...")
+        failed = send_digest_emails(deliveries)
+    if HISTORY_ENABLED:
+        for profile, digest, _ in deliveries:
+            if profile["name"] not in failed:
+                get_history().store_digest(digest, profile=profile["name"])
+    sent = {v["video_id"] for profile, _, selected in deliveries if profile["name"] not in failed for v in selected}
+    unsent = {v["video_id"] for profile, _, selected in deliveries if profile["name"] in failed for v in selected}
+    mark_videos_seen([r for r in results if r["video_id"] in sent or r["video_id"] not in unsent], found)
 
-    # 4. Send email
-    print("\nSending digest email...")
-    send_digest_email(digest, analyzed)
+    print(f"\nClaude usage: {usage}")
+    for line in usage.stage_lines():
+        print(f"  {line}")
 
+    if failed:
+        raise next(iter(failed.values()))
     print("\nDone!")
 
 
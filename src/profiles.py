@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+import os
+
+from aggregator import normalize_symbol
+from config import CHANNEL_IDS, RECIPIENT_EMAIL, RECIPIENT_PROFILES
+
+DEFAULT_PROFILE = "default"
+
+
+def load_profiles(raw: str = RECIPIENT_PROFILES) -> list[dict]:
+    """Recipient profiles from RECIPIENT_PROFILES: JSON, or the path of a JSON file.
+
+    Each profile has a name, recipients, and optionally channels (ids or names;
+    all channels if empty) and tickers (only videos mentioning one of them; all
+    videos if empty). Without any, everything goes to RECIPIENT_EMAIL.
+    """
+    if not raw.strip():
+        return [{"name": DEFAULT_PROFILE, "recipients": [RECIPIENT_EMAIL], "channels": [], "tickers": []}]
+
+    if not raw.lstrip().startswith("["):
+        with open(os.path.expanduser(raw), "r", encoding="utf-8") as f:
+            raw = f.read()
+
+    profiles = []
+    for i, entry in enumerate(json.loads(raw)):
+        name = entry.get("name") or f"profile {i + 1}"
+        recipients = entry.get("recipients") or []
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        if not recipients:
+            raise ValueError(f"Recipient profile '{name}' has no recipients")
+        profiles.append({
+            "name": name,
+            "recipients": recipients,
+            "channels": list(entry.get("channels") or []),
+            "tickers": [s for s in (normalize_symbol(t) for t in entry.get("tickers") or []) if s],
+        })
+    return profiles
+
+
+def profile_channel_ids(profiles: list[dict]) -> list[str]:
+    """CHANNEL_IDS plus any other channel ids the profiles follow, in order."""
+    channel_ids = list(CHANNEL_IDS)
+    for profile in profiles:
+        for channel in profile["channels"]:
+            if channel.startswith("UC") and len(channel) == 24 and channel not in channel_ids:
+                channel_ids.append(channel)
+    return channel_ids
+
+
+def select_videos(profile: dict, videos: list[dict]) -> list[dict]:
+    """The videos a profile receives: from its channels, mentioning one of its tickers."""
+    channels = {c.lower() for c in profile["channels"]}
+    tickers = set(profile["tickers"])
+    selected = []
+    for video in videos:
+        if channels and video["channel_id"].lower() not in channels and video["channel"].lower() not in channels:
+            continue
+        if tickers and not any(
+            normalize_symbol(t.get("symbol", "")) in tickers for t in video["analysis"].get("tickers", [])
+        ):
+            continue
+        selected.append(video)
+    return selected
+
+
+def filter_digest(profile: dict, digest: dict) -> dict:
+    """The digest with top tickers and key levels limited to the profile's tickers, if it has any."""
+    tickers = set(profile["tickers"])
+    if not tickers:
+        return digest
+    return {
+        **digest,
+        "top_tickers": [t for t in digest.get("top_tickers", []) if t["symbol"] in tickers],
+        "key_levels_to_watch": [
+            line for line in digest.get("key_levels_to_watch", []) if line.split(":", 1)[0] in tickers
+        ],
+    }
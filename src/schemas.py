@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+SENTIMENTS = ("bullish", "bearish", "neutral")
+
+# Triage verdicts; anything but "keep" skips the full summary
+VERDICTS = ("keep", "sponsored", "off_topic", "low_information")
+
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+
+# ---------------------------------------------------------------------------
+# JSON schemas, sent to Claude as forced tool calls
+# ---------------------------------------------------------------------------
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "is_sponsored": {
+            "type": "boolean",
+            "description": "True only if the whole video is a paid promotion or sponsored advertisement",
+        },
+        "summary": {
+            "type": "string",
+            "description": "3-5 sentence summary that captures the creator's specific thesis, key price levels "
+                           "mentioned, and their directional bias. Include numbers.",
+        },
+        "key_claims": {
+            **_STRING_LIST,
+            "description": "4-8 specific claims or predictions with numbers/levels attached, including the "
+                           "creator's reasoning, e.g. 'SPY needs to hold $445 support or risks a move to $430'",
+        },
+        "tickers": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "symbol": {"type": "string", "description": "Ticker symbol, e.g. BTC or SPY"},
+                    "sentiment": {"type": "string", "enum": list(SENTIMENTS)},
+                    "price_levels": {
+                        "type": "string",
+                        "description": "Exact levels mentioned, e.g. 'Rejected at $52,400 resistance, support at "
+                                       "$48,800, next target $46,500', or 'No specific levels mentioned'",
+                    },
+                    "thesis": {
+                        "type": "string",
+                        "description": "The creator's reasoning, e.g. 'Forming lower highs on daily, buyers "
+                                       "failing to follow through on bounces'",
+                    },
+                },
+                "required": ["symbol", "sentiment", "price_levels", "thesis"],
+            },
+        },
+        "trade_ideas": {
+            **_STRING_LIST,
+            "description": "Explicit trade setups the creator suggested, with entry, target and stop if given "
+                           "(empty if none)",
+        },
+        "risks_and_warnings": {
+            **_STRING_LIST,
+            "description": "Macro risks, upcoming catalysts or scenarios that could invalidate the thesis, e.g. "
+                           "'CPI data Thursday could invalidate this setup'",
+        },
+    },
+    "required": ["is_sponsored", "summary", "key_claims", "tickers", "trade_ideas", "risks_and_warnings"],
+}
+
+DIGEST_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "market_overview": {
+            "type": "string",
+            "description": "4-6 sentence overview of today's key market themes. Reference specific price levels, "
+                           "sectors, and catalysts. This should read like a Bloomberg terminal morning note.",
+        },
+        "consensus_themes": {
+            **_STRING_LIST,
+            "description": "Themes multiple channels agree on: what they agree on and why",
+        },
+        "conflicting_views": {
+            **_STRING_LIST,
+            "description": "Where channels specifically disagree, naming the channels and their opposing positions",
+        },
+        "ticker_notes": {
+            "type": "object",
+            "additionalProperties": {"type": "string"},
+            "description": "Symbol -> specific synthesis of what was said across channels, including price levels",
+        },
+        "action_items": {
+            **_STRING_LIST,
+            "description": "Specific actions, ranked by how many channels support them and urgency",
+        },
+        "risk_alerts": {
+            **_STRING_LIST,
+            "description": "Specific risks with date/catalyst if applicable, e.g. 'CPI data Thursday 8:30 AM ET "
+                           "could spike volatility'",
+        },
+        "upcoming_catalysts": {
+            **_STRING_LIST,
+            "description": "Dated events: earnings reports, economic data releases, Fed meetings, etc.",
+        },
+    },
+    "required": [
+        "market_overview", "consensus_themes", "conflicting_views", "ticker_notes",
+        "action_items", "risk_alerts", "upcoming_catalysts",
+    ],
+}
+
+TRIAGE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "verdict": {
+            "type": "string",
+            "enum": list(VERDICTS),
+            "description": "sponsored: the whole video is a paid promotion. off_topic: not about markets, "
+                           "trading or the economy. low_information: a rerun, re-upload, stream placeholder "
+                           "or filler with no new analysis. keep: anything else, and whenever unsure.",
+        },
+        "reason": {"type": "string", "description": "One short sentence explaining the verdict"},
+    },
+    "required": ["verdict", "reason"],
+}
+
+ANALYSIS_TOOL = {
+    "name": "record_analysis",
+    "description": "Record the analysis of one video.",
+    "input_schema": ANALYSIS_SCHEMA,
+}
+
+DIGEST_TOOL = {
+    "name": "record_digest",
+    "description": "Record the daily market digest.",
+    "input_schema": DIGEST_SCHEMA,
+}
+
+TRIAGE_TOOL = {
+    "name": "record_triage",
+    "description": "Record whether the video is worth a full analysis.",
+    "input_schema": TRIAGE_SCHEMA,
+}
+
+
+# ---------------------------------------------------------------------------
+# Validation
+# ---------------------------------------------------------------------------
+
+_TYPES = {"string": str, "boolean": bool, "object": dict, "array": list}
+
+
+def _check(value, schema: dict, path: str):
+    """Return (value, error) for `value` against a (small subset of) JSON schema.
+
+    Enum strings are matched case-insensitively and normalized.
+    """
+    expected = _TYPES[schema["type"]]
+    if not isinstance(value, expected):
+        article = "an" if schema["type"][0] in "aeiou" else "a"
+        return None, f"{path} must be {article} {schema['type']}"
+
+    if "enum" in schema:
+        normalized = value.strip().lower()
+        if normalized not in schema["enum"]:
+            return None, f"{path} must be one of {', '.join(schema['enum'])}"
+        return normalized, None
+
+    if schema["type"] == "array":
+        items = []
+        for i, item in enumerate(value):
+            item, error = _check(item, schema["items"], f"{path}[{i}]")
+            if error:
+                return None, error
+            items.append(item)
+        return items, None
+
+    if schema["type"] == "object":
+        result = {}
+        for key in schema.get("required", []):
+            if key not in value:
+                return None, f"{path}.{key} is missing"
+        for key, item in value.items():
+            item_schema = schema.get("properties", {}).get(key, schema.get("additionalProperties"))
+            if item_schema is None:
+                continue
+            item, error = _check(item, item_schema, f"{path}.{key}")
+            if error:
+                return None, error
+            result[key] = item
+        return result, None
+
+    return value, None
+
+
+def validate(data: Optional[dict], schema: dict) -> tuple[dict, dict[str, str]]:
+    """Check each top-level field of `data` against `schema`.
+
+    Returns (valid fields, {field: error}) so that only the failing fields need
+    to be asked for again.
+    """
+    data = data if isinstance(data, dict) else {}
+    valid = {}
+    errors = {}
+    for name, field_schema in schema["properties"].items():
+        if name not in data:
+            errors[name] = f"{name} is missing"
+            continue
+        value, error = _check(data[name], field_schema, name)
+        if error:
+            errors[name] = error
+        else:
+            valid[name] = value
+    return valid, errors
+
+
+def partial_schema(schema: dict, fields) -> dict:
+    """`schema` reduced to the given top-level fields, all required."""
+    return {
+        "type": "object",
+        "properties": {name: schema["properties"][name] for name in fields},
+        "required": list(fields),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Typed results
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Ticker:
+    __slots__ = ("symbol", "sentiment", "price_levels", "thesis")
+    symbol: str
+    sentiment: str
+    price_levels: str
+    thesis: str
+
+
+@dataclass
+class Analysis:
+    __slots__ = ("is_sponsored", "summary", "key_claims", "tickers", "trade_ideas", "risks_and_warnings")
+    is_sponsored: bool
+    summary: str
+    key_claims: list[str]
+    tickers: list[Ticker]
+    trade_ideas: list[str]
+    risks_and_warnings: list[str]
+
+    @classmethod
+    def from_fields(cls, fields: dict) -> "Analysis":
+        """Build from fields that passed validate() against ANALYSIS_SCHEMA."""
+        return cls(**{**fields, "tickers": [Ticker(**t) for t in fields["tickers"]]})
+
+    @classmethod
+    def empty(cls) -> "Analysis":
+        return cls(False, "", [], [], [], [])
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class Digest:
+    __slots__ = (
+        "market_overview", "consensus_themes", "conflicting_views", "ticker_notes",
+        "action_items", "risk_alerts", "upcoming_catalysts",
+    )
+    market_overview: str
+    consensus_themes: list[str]
+    conflicting_views: list[str]
+    ticker_notes: dict[str, str]
+    action_items: list[str]
+    risk_alerts: list[str]
+    upcoming_catalysts: list[str]
+
+    @classmethod
+    def from_fields(cls, fields: dict) -> "Digest":
+        """Build from fields that passed validate() against DIGEST_SCHEMA."""
+        return cls(**fields)
+
+    @classmethod
+    def empty(cls) -> "Digest":
+        return cls("", [], [], {}, [], [], [])
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class Triage:
+    __slots__ = ("verdict", "reason")
+    verdict: str
+    reason: str
+
+    @classmethod
+    def keep(cls, reason: str) -> "Triage":
+        return cls("keep", reason)
+
+    @property
+    def skip(self) -> bool:
+        return self.verdict != "keep"
+
+    def to_dict(self) -> dict:
+        return asdict(self)
@@ -1,20 +1,173 @@
 import json
+import random
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
 
 import anthropic
 
-from config import ANTHROPIC_API_KEY, CLAUDE_MODEL
+from aggregator import TOP_TICKERS, aggregate_tickers, key_levels, normalize_symbol, ticker_table, top_tickers
+from cache import get_summary_cache, summary_key
+from compactor import estimate_tokens
+from dedup import DuplicateIndex
+from history import get_history
+from profiles import DEFAULT_PROFILE
+from schemas import (
+    ANALYSIS_TOOL,
+    DIGEST_TOOL,
+    TRIAGE_SCHEMA,
+    TRIAGE_TOOL,
+    Analysis,
+    Digest,
+    Triage,
+    partial_schema,
+    validate,
+)
+from config import (
+    ANTHROPIC_API_KEY,
+    CLAUDE_MODEL,
+    DIGEST_MODEL,
+    TRIAGE_ENABLED,
+    DEDUP_ENABLED,
+    HISTORY_ENABLED,
+    HISTORY_CONTEXT_DAYS,
+    HISTORY_CONTEXT_ROWS,
+    TRIAGE_MODEL,
+    TRIAGE_SAMPLE_TOKENS,
+    TRIAGE_TIMEOUT_SECONDS,
+    CLAUDE_TIMEOUT_SECONDS,
+    MODEL_PRICES,
+    SUMMARY_PROMPT_VERSION,
+    SUMMARY_CONCURRENCY,
+    CLAUDE_MAX_RETRIES,
+    CLAUDE_STREAMING,
+    BATCH_TIMEOUT_MINUTES,
+    SUMMARY_CHUNK_TOKENS,
+    DIGEST_CHUNK_TOKENS,
+)
+from telemetry import pool_map, record, span, submit
 
-client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+# Retries are handled by _with_retries so they can be logged and jittered
+client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY, max_retries=0)
 
-VIDEO_SUMMARY_PROMPT = """\
-You are a senior financial analyst writing a briefing for a portfolio manager who CANNOT watch this video. \
-Your job is to extract every specific, concrete claim so they have the same information as someone who watched it.
+# 408 = request timeout, 409 = conflict, 429 = rate limited; any 5xx (including
+# 529 = API overloaded) and connection errors are retried as well
+RETRYABLE_STATUS_CODES = {408, 409, 429}
 
-Video: "{title}" by {channel}
+# Errors that arrive inside a streamed reply come with the stream's HTTP 200,
+# so they are recognized by their error type
+RETRYABLE_ERROR_TYPES = {"overloaded_error", "rate_limit_error", "api_error"}
+RETRY_BASE_DELAY_SECONDS = 2
+RETRY_MAX_DELAY_SECONDS = 60
 
-Transcript:
-{transcript}
+# Shared by every thread (including the per-chunk pools inside summary workers),
+# so no more than SUMMARY_CONCURRENCY requests are in flight at any time
+_request_slots = threading.BoundedSemaphore(max(1, SUMMARY_CONCURRENCY))
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+BATCH_POLL_INITIAL_SECONDS = 15
+BATCH_POLL_MAX_SECONDS = 300
+
+# Prices of prompt cache writes and reads relative to regular input tokens, and
+# of Message Batches requests relative to regular ones
+CACHE_WRITE_PRICE_FACTOR = 1.25
+CACHE_READ_PRICE_FACTOR = 0.1
+BATCH_PRICE_FACTOR = 0.5
+
+
+def _cost(model: str, counts: dict) -> float:
+    """USD cost of one response's token counts at MODEL_PRICES (0 for unknown models)."""
+    prices = next((p for prefix, p in MODEL_PRICES.items() if model.startswith(prefix)), None)
+    if prices is None:
+        return 0.0
+    input_price, output_price = prices
+    return (
+        counts["input_tokens"] * input_price
+        + counts["cache_creation_input_tokens"] * input_price * CACHE_WRITE_PRICE_FACTOR
+        + counts["cache_read_input_tokens"] * input_price * CACHE_READ_PRICE_FACTOR
+        + counts["output_tokens"] * output_price
+    ) / 1e6
+
+
+class TokenUsage:
+    """Running totals of Claude token usage for this run, including prompt caching.
+
+    Also kept per pipeline stage ("triage", "summary", "digest"), with the model,
+    number of calls, estimated cost and seconds spent in calls.
+    """
+
+    def __init__(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_creation_input_tokens = 0
+        self.cache_read_input_tokens = 0
+        self.cost_usd = 0.0
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, usage, stage: str, model: str, seconds: float = 0.0, batch: bool = False) -> None:
+        """Add a response's usage to the totals and to the current telemetry span."""
+        counts = {
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens,
+            "cache_creation_input_tokens": usage.cache_creation_input_tokens or 0,
+            "cache_read_input_tokens": usage.cache_read_input_tokens or 0,
+        }
+        cost = _cost(model, counts) * (BATCH_PRICE_FACTOR if batch else 1)
+        with self._lock:
+            for key, value in counts.items():
+                setattr(self, key, getattr(self, key) + value)
+            self.cost_usd += cost
+            stats = self.stages.setdefault(stage, {
+                "model": model, "calls": 0, **dict.fromkeys(counts, 0), "cost_usd": 0.0, "seconds": 0.0,
+            })
+            stats["model"] = model
+            stats["calls"] += 1
+            for key, value in counts.items():
+                stats[key] += value
+            stats["cost_usd"] += cost
+            stats["seconds"] += seconds
+        record(**counts, cost_usd=cost)
+
+    def by_stage(self) -> dict:
+        """Copy of the per-stage totals, with cost and seconds rounded."""
+        with self._lock:
+            return {
+                stage: {**stats, "cost_usd": round(stats["cost_usd"], 4), "seconds": round(stats["seconds"], 2)}
+                for stage, stats in self.stages.items()
+            }
+
+    def stage_lines(self) -> list[str]:
+        """One line per stage, e.g. "triage: claude-haiku-4-5, 12 call(s), ... $0.014, 9.1s in calls"."""
+        return [
+            f"{stage}: {stats['model']}, {stats['calls']} call(s), "
+            f"{stats['input_tokens'] + stats['cache_creation_input_tokens'] + stats['cache_read_input_tokens']} "
+            f"input / {stats['output_tokens']} output token(s), ${stats['cost_usd']:.3f}, "
+            f"{stats['seconds']:.1f}s in calls"
+            for stage, stats in self.by_stage().items()
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.input_tokens} input, {self.output_tokens} output, "
+            f"{self.cache_creation_input_tokens} cache write, "
+            f"{self.cache_read_input_tokens} cache read token(s), ~${self.cost_usd:.2f}"
+        )
+
+
+usage = TokenUsage()
+
+# Static instructions, sent as a cached system block so the identical prefix is
+# only processed once across all videos in a run. The output schema is the
+# record_analysis tool (see schemas.py). The example keeps the cached prefix
+# (tool definition + system) above the 1024-token minimum Sonnet caches at all;
+# see _check_prompt_cache.
+VIDEO_SUMMARY_SYSTEM = """\
+You are a senior financial analyst writing a briefing for a portfolio manager who CANNOT watch the video whose transcript you are given. \
+Your job is to extract every specific, concrete claim so they have the same information as someone who watched it.
 
 RULES:
 1. SPECIFICITY IS EVERYTHING. Never write vague summaries. Extract exact numbers, prices, levels, dates, \
@@ -29,31 +182,7 @@ change their mind? What timeframe are they operating on?
 5. INCLUDE SPECIFIC LEVELS. Support, resistance, moving averages, RSI readings, volume observations — \
 anything with a number attached.
 
-Respond in JSON:
-{{
-  "is_sponsored": false,
-  "summary": "3-5 sentence summary that captures the creator's specific thesis, key price levels mentioned, \
-and their directional bias. Include numbers.",
-  "key_claims": [
-    "Specific factual claim or prediction from the video with numbers/levels attached",
-    "Another concrete claim — e.g., 'SPY needs to hold $445 support or risks a move to $430'",
-    "Include the creator's reasoning, not just conclusions"
-  ],
-  "tickers": [
-    {{
-      "symbol": "BTC",
-      "sentiment": "bearish",
-      "price_levels": "Rejected at $52,400 resistance, support at $48,800, next target $46,500",
-      "thesis": "Forming lower highs on daily, buyers failing to follow through on bounces"
-    }}
-  ],
-  "trade_ideas": [
-    "Specific trade setup or actionable idea mentioned — include entry, target, stop if given"
-  ],
-  "risks_and_warnings": [
-    "Specific risk the creator flagged — e.g., 'CPI data Thursday could invalidate this setup'"
-  ]
-}}
+Record your analysis with the record_analysis tool.
 
 IMPORTANT:
 - "key_claims" is the most important field. These should be specific enough that someone reading them \
@@ -65,100 +194,395 @@ any specific trades, return an empty list.
 - "risks_and_warnings" should capture macro risks, upcoming catalysts, or scenarios that could invalidate the thesis.
 - Sentiment must be: bullish, bearish, or neutral.
 - If the video is entirely sponsored, set "is_sponsored" to true and leave all other fields empty/minimal.
-Return ONLY valid JSON, no markdown fences."""
+
+EXAMPLE of a good record_analysis call, for a 20 minute video on Bitcoin and the Nasdaq:
+{
+  "is_sponsored": false,
+  "summary": "The creator is short-term bearish on Bitcoin after a second rejection at $52,400 and expects a \
+retest of $48,800 support before any new high, while staying bullish on the weekly trend above the 50-week \
+moving average at $44,900. They see the Nasdaq as the bigger risk into Thursday's CPI print, with QQQ stretched \
+8% above its 50-day average. They would flip bullish on Bitcoin on a daily close above $53,000 on rising volume.",
+  "key_claims": [
+    "BTC rejected at $52,400 for the second time in a week, forming a lower high on the daily chart; a loss \
+of $48,800 opens a move to $46,500, the top of the February range",
+    "Daily RSI on BTC printed 71 at the last high against 78 at the prior one, a bearish divergence they say \
+preceded the last three 10%+ pullbacks",
+    "Spot Bitcoin ETF inflows slowed from ~$500M a day to under $100M this week, removing the main bid that \
+carried price from $42,000",
+    "QQQ is 8% above its 50-day moving average, a stretch last seen before the July pullback; they expect mean \
+reversion toward $425 if CPI comes in hot",
+    "A CPI print at or below 3.1% year over year would invalidate the bearish view and likely send BTC through \
+$53,000 within days",
+    "Weekly structure stays bullish while BTC holds the 50-week moving average at $44,900"
+  ],
+  "tickers": [
+    {"symbol": "BTC", "sentiment": "bearish", "price_levels": "Resistance $52,400 (double rejection), \
+support $48,800, target $46,500, 50-week MA $44,900, bullish above a daily close over $53,000", \
+"thesis": "Lower high and RSI divergence on the daily while ETF inflows fade; short-term pullback inside \
+a weekly uptrend"},
+    {"symbol": "QQQ", "sentiment": "neutral", "price_levels": "8% above the 50-day MA, mean reversion \
+target $425", "thesis": "Stretched into CPI; direction depends on the print"}
+  ],
+  "trade_ideas": [
+    "Short BTC on a retest of $52,000-$52,400, target $48,800, stop on a daily close above $53,000"
+  ],
+  "risks_and_warnings": [
+    "CPI on Thursday at 8:30 AM ET: a print at or below 3.1% invalidates the bearish BTC setup",
+    "A weekly close below $44,900 on BTC would break the weekly uptrend"
+  ]
+}"""
+
+VIDEO_SUMMARY_PROMPT = """\
+Video: "{title}" by {channel}
+
+Transcript:
+{transcript}"""
+
+VIDEO_CHUNK_PROMPT = """\
+Video: "{title}" by {channel}
+
+The transcript of this video is too long for one pass, so it is analyzed in {parts} consecutive parts. \
+Analyze only the part below; the parts are merged afterwards.
+
+Transcript (part {part} of {parts}):
+{transcript}"""
+
+VIDEO_MERGE_PROMPT = """\
+Video: "{title}" by {channel}
+
+The transcript of this video was analyzed in {parts} consecutive parts. Merge the partial analyses below \
+into one analysis of the whole video and record it with the record_analysis tool. Keep every specific number and level, \
+drop duplicates, and where the creator revised a view later in the video, keep the later view. \
+Set "is_sponsored" to true only if every part was sponsored.
+
+Partial analyses (in order):
+{analyses_json}"""
 
 DIGEST_PROMPT = """\
 You are a senior financial analyst writing a morning briefing for a portfolio manager. \
-Below are detailed summaries from multiple YouTube finance channels. Synthesize them into a \
-concise, actionable digest.
+Below are detailed summaries from multiple YouTube finance channels, followed by a table of every ticker \
+they mention (exact mention counts, each channel's sentiment, price levels and thesis). Synthesize them \
+into a concise, actionable digest.
 
 Video Summaries:
 {summaries_json}
 
-Create a cohesive daily market digest in JSON. Be SPECIFIC — include exact prices, levels, and percentages \
-from the underlying video analyses. Do not generalize away the details.
+Tickers:
+{tickers_json}
 
-{{
-  "market_overview": "4-6 sentence overview of today's key market themes. Reference specific price levels, \
-sectors, and catalysts. This should read like a Bloomberg terminal morning note.",
-  "consensus_themes": [
-    "Theme multiple channels agree on — be specific about what they agree on and WHY"
-  ],
-  "conflicting_views": [
-    "Where channels specifically disagree — name the channels and their opposing positions"
-  ],
-  "top_tickers": [
-    {{
-      "symbol": "AAPL",
-      "sentiment": "bullish",
-      "mention_count": 3,
-      "summary": "Specific synthesis of what was said across channels, including price levels"
-    }}
-  ],
-  "key_levels_to_watch": [
-    "SPY: Support at $445, resistance at $458 (TheChartGuys)",
-    "BTC: Must hold $48,800 or risk move to $46,500 (TheChartGuys)"
-  ],
-  "action_items": [
-    "Specific, prioritized action — ranked by how many channels support it and urgency"
-  ],
-  "risk_alerts": [
-    "Specific risk with date/catalyst if applicable — e.g., 'CPI data Thursday 8:30 AM ET could spike volatility'"
-  ],
-  "upcoming_catalysts": [
-    "Earnings report, economic data release, Fed meeting, etc. with dates"
-  ]
-}}
+Earlier context (previous days' mentions of these tickers and the last digest's overview; for comparison \
+only, not today's news):
+{history_json}
+
+Create a cohesive daily market digest. Be SPECIFIC — include exact prices, levels, and percentages \
+from the underlying video analyses. Do not generalize away the details. Record the digest with the \
+record_digest tool.
 
 Rules:
-- "key_levels_to_watch" is critical — pull every specific support/resistance/target mentioned across all videos.
+- Mention counts and the list of key levels are compiled from the ticker table separately. Do not repeat \
+them as lists; use them in the narrative.
+- "ticker_notes" must have a one or two sentence note for each of: {note_symbols}.
 - "upcoming_catalysts" should list any dated events mentioned (earnings, Fed, economic data, etc.).
 - Do not water down specific claims into vague generalities.
-- Attribute conflicting views to their source channels.
-Return ONLY valid JSON, no markdown fences."""
+- Attribute conflicting views to their source channels; the per-channel sentiment in the ticker table \
+shows where they disagree.
+- Where a channel's view or levels on a ticker changed from the earlier context, say so in its ticker note."""
+
 
+DIGEST_MERGE_PROMPT = """\
+You are a senior financial analyst writing a morning briefing for a portfolio manager. \
+Today's video summaries were too many to read at once, so they were digested in {parts} groups of channels. \
+Merge the partial digests below into one digest and record it with the record_digest tool.
+
+Partial digests:
+{digests_json}
 
-def _clean_json_response(text: str) -> str:
-    """Strip markdown code fences and whitespace from Claude's JSON response."""
-    cleaned = text.strip()
-    # Remove ```json ... ``` or ``` ... ``` wrappers
-    match = re.match(r"^```(?:json)?\s*\n?(.*?)\n?\s*```$", cleaned, re.DOTALL)
-    if match:
-        cleaned = match.group(1).strip()
-    return cleaned
+Rules:
+- "market_overview" must synthesize all groups into one 4-6 sentence overview, not describe them one by one.
+- Keep every specific price level, percentage and date. Only drop exact duplicates.
+- A theme found in several groups is a consensus theme. Where groups take opposing positions on the same \
+ticker or theme, put it in "conflicting_views" and attribute each side to its channels.
+- Combine "ticker_notes" for the same symbol into one note, and keep notes only for: {note_symbols}.
+- Rank "action_items" by how many channels support them and by urgency."""
 
 
-def summarize_video(video: dict) -> dict:
-    """Summarize a single video transcript using Claude."""
-    # Truncate very long transcripts to stay within context limits
-    transcript = video["transcript"][:50000]
+TRIAGE_PROMPT = """\
+Video: "{title}" by {channel}
+
+Decide whether this video from a finance channel is worth a full analysis for a daily market briefing, \
+and record your verdict with the record_triage tool. Skip it only when the transcript makes that clear; \
+when unsure, keep it.
+
+Transcript (for long videos only the start and end, with the middle left out):
+{sample}"""
+
+
+def _retryable(error: anthropic.APIError) -> bool:
+    if isinstance(error, anthropic.APIConnectionError):  # includes timeouts
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        if error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500:
+            return True
+        body = error.body if isinstance(error.body, dict) else {}
+        detail = body.get("error") if isinstance(body.get("error"), dict) else body
+        return detail.get("type") in RETRYABLE_ERROR_TYPES
+    return False
+
+
+def _retry_delay(error: anthropic.APIError, attempt: int) -> float:
+    """Seconds to wait before retrying: the server's retry-after, else jittered backoff."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_MAX_DELAY_SECONDS)
+        except ValueError:
+            pass
+    backoff = min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** attempt)
+    return random.uniform(backoff / 2, backoff)
+
+
+def _with_retries(request, call=None):
+    """request() with up to CLAUDE_MAX_RETRIES retries on transient API errors.
+
+    Each attempt waits for one of the SUMMARY_CONCURRENCY request slots; none is
+    held while waiting to retry. Retries are counted on the telemetry span
+    `call`, if given.
+    """
+    for attempt in range(CLAUDE_MAX_RETRIES + 1):
+        try:
+            with _request_slots:
+                return request()
+        except anthropic.APIError as e:
+            if not _retryable(e) or attempt == CLAUDE_MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            if call is not None:
+                call.add(retries=1)
+            reason = type(e).__name__
+            if isinstance(e, anthropic.APIStatusError):
+                reason = e.status_code
+                if e.status_code == 200 and isinstance(e.body, dict):
+                    reason = (e.body.get("error") or {}).get("type", reason)
+            print(f"    Claude request failed ({reason}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+def _create_message(stage: str = "summary", timeout: float = CLAUDE_TIMEOUT_SECONDS, **params):
+    """Send a message (streamed if CLAUDE_STREAMING), retrying transient errors.
+
+    Streaming keeps long replies from hitting HTTP read timeouts. Usage, cost and
+    time are counted towards `stage`.
+    """
+    with span("claude.messages", model=params["model"], stage=stage, stream=CLAUDE_STREAMING) as call:
+        start = time.perf_counter()
+
+        def request():
+            if CLAUDE_STREAMING:
+                with client.messages.stream(timeout=timeout, **params) as stream:
+                    return stream.get_final_message()
+            return client.messages.create(timeout=timeout, **params)
+
+        response = _with_retries(request, call)
+        usage.add(response.usage, stage, response.model, time.perf_counter() - start)
+        _check_prompt_cache(params, response)
+        if response.stop_reason == "max_tokens":
+            call.set(truncated=True)
+        return response
+
+
+_cache_warned = threading.Event()
 
+
+def _check_prompt_cache(params: dict, response) -> None:
+    """Warn once if a request with a cache breakpoint neither wrote nor read the cache.
+
+    That happens when the prefix up to the breakpoint is below the model's minimum
+    cacheable length (1024 tokens for Sonnet), so cache_control does nothing.
+    """
+    system = params.get("system")
+    if not isinstance(system, list) or not any("cache_control" in block for block in system):
+        return
+    if response.usage.cache_creation_input_tokens or response.usage.cache_read_input_tokens:
+        return
+    if not _cache_warned.is_set():
+        _cache_warned.set()
+        print(f"  Warning: prompt cache not used by {response.model}; the cached prefix is "
+              f"probably shorter than the model's minimum")
+
+
+# Everything besides the transcript that shapes a video's analysis: the prompts
+# for one pass and for long videos, the tool schema and where videos are split
+_SUMMARY_KEY_PROMPT = "\0".join([
+    VIDEO_SUMMARY_SYSTEM,
+    VIDEO_SUMMARY_PROMPT,
+    VIDEO_CHUNK_PROMPT,
+    VIDEO_MERGE_PROMPT,
+    json.dumps(ANALYSIS_TOOL, sort_keys=True),
+    str(SUMMARY_CHUNK_TOKENS),
+])
+
+
+def _summary_cache_key(video: dict) -> str:
+    return summary_key(
+        video["video_id"],
+        video["transcript"],
+        CLAUDE_MODEL,
+        _SUMMARY_KEY_PROMPT,
+        SUMMARY_PROMPT_VERSION,
+    )
+
+
+def _split_transcript(text: str, max_tokens: int) -> list[str]:
+    """Split a transcript into chunks of at most ~max_tokens, on sentence boundaries.
+
+    Auto-generated captions often have no punctuation, so overlong "sentences" are
+    split further on word boundaries.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    max_chars = max_tokens * 4
+    pieces = []
+    for sentence in _SENTENCE_END_RE.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            pieces.append(sentence)
+
+    chunks = []
+    current = []
+    size = 0
+    for piece in pieces:
+        if current and size + len(piece) + 1 > max_chars:
+            chunks.append(" ".join(current))
+            current = []
+            size = 0
+        current.append(piece)
+        size += len(piece) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _analysis_request(prompt: str, max_tokens: int = 2048) -> dict:
+    """messages.create parameters for one analysis call (shared cached system prompt)."""
+    return {
+        "model": CLAUDE_MODEL,
+        "max_tokens": max_tokens,
+        "system": [
+            {"type": "text", "text": VIDEO_SUMMARY_SYSTEM, "cache_control": {"type": "ephemeral"}},
+        ],
+        "tools": [ANALYSIS_TOOL],
+        "tool_choice": {"type": "tool", "name": ANALYSIS_TOOL["name"]},
+        "messages": [{"role": "user", "content": prompt}],
+    }
+
+
+def _summary_request(video: dict) -> dict:
+    """Build the messages.create parameters for summarizing one video in a single pass."""
     prompt = VIDEO_SUMMARY_PROMPT.format(
         title=video["title"],
         channel=video["channel"],
-        transcript=transcript,
+        transcript=video["transcript"],
     )
+    return _analysis_request(prompt)
+
+
+def _tool_input(response, tool: dict) -> dict:
+    """The input of the reply's call to `tool` ({} if it did not call it).
+
+    A streamed reply cut off at max_tokens still has the tool input the SDK
+    could parse from the partial JSON.
+    """
+    for block in response.content:
+        if block.type == "tool_use" and block.name == tool["name"]:
+            return block.input if isinstance(block.input, dict) else {}
+    return {}
 
-    response = client.messages.create(
-        model=CLAUDE_MODEL,
-        max_tokens=2048,
-        messages=[{"role": "user", "content": prompt}],
+
+def _repair_request(request: dict, response, tool: dict, errors: dict[str, str]) -> dict:
+    """Follow-up to `request` that asks again for only the fields in `errors`, saying what was wrong."""
+    problems = "\n".join(f"- {error}" for error in errors.values())
+    instruction = (
+        f"These fields were missing or invalid:\n{problems}\n"
+        f"Call {tool['name']} again with only these fields: {', '.join(errors)}."
     )
+    tool_use = next((b for b in response.content if b.type == "tool_use"), None)
+    if tool_use is not None:
+        turns = [
+            {"role": "assistant", "content": [{
+                "type": "tool_use",
+                "id": tool_use.id,
+                "name": tool_use.name,
+                "input": tool_use.input if isinstance(tool_use.input, dict) else {},
+            }]},
+            {"role": "user", "content": [{
+                "type": "tool_result", "tool_use_id": tool_use.id, "is_error": True, "content": instruction,
+            }]},
+        ]
+    else:
+        text = "".join(b.text for b in response.content if b.type == "text")
+        turns = [
+            {"role": "assistant", "content": text or "(no reply)"},
+            {"role": "user", "content": instruction},
+        ]
 
-    raw_text = response.content[0].text
-    cleaned = _clean_json_response(raw_text)
+    return {
+        **request,
+        "tools": [{**tool, "input_schema": partial_schema(tool["input_schema"], errors)}],
+        "tool_choice": {"type": "tool", "name": tool["name"]},
+        "messages": request["messages"] + turns,
+    }
 
-    try:
-        result = json.loads(cleaned)
-    except json.JSONDecodeError:
-        print(f"  Warning: Could not parse JSON for '{video['title']}', using raw text")
-        result = {
-            "summary": cleaned[:500],
-            "key_claims": [],
-            "tickers": [],
-            "trade_ideas": [],
-            "risks_and_warnings": [],
-        }
+
+def _structured(request: dict, tool: dict, label: str, response=None, stage: str = "summary"):
+    """Send `request` (unless its `response` is given) and validate the tool input.
+
+    Fields that are missing or invalid, e.g. because the reply was cut off, are
+    asked for once more on their own. Returns (valid fields, {field: error} for
+    fields still invalid, whether the first reply was cut off at max_tokens).
+    A cut-off reply can leave a field that validates but is incomplete.
+    """
+    if response is None:
+        response = _create_message(stage, **request)
+    truncated = response.stop_reason == "max_tokens"
+    schema = tool["input_schema"]
+    fields, errors = validate(_tool_input(response, tool), schema)
+    if not errors:
+        return fields, errors, truncated
+
+    print(f"  Warning: {label}: {'; '.join(errors.values())} — asking again for those field(s)")
+    repair = _create_message(stage, **_repair_request(request, response, tool, errors))
+    fixed, errors = validate(_tool_input(repair, tool), partial_schema(schema, errors))
+    fields.update(fixed)
+    if errors:
+        print(f"  Warning: {label}: still invalid after repair: {'; '.join(errors.values())}")
+    return fields, errors, truncated
+
+
+def _analysis_result(label: str, request: dict, response=None):
+    """Validated analysis dict for an analysis request. Returns (analysis, complete).
+
+    Fields that could not be repaired are left empty. `complete` is False then,
+    and also when the reply was cut off (a field may be incomplete).
+    """
+    fields, errors, truncated = _structured(request, ANALYSIS_TOOL, label, response)
+    analysis = Analysis.from_fields({**Analysis.empty().to_dict(), **fields})
+    return analysis.to_dict(), not errors and not truncated
+
+
+def _summary_result(video: dict, request: dict, response=None) -> dict:
+    """The video with its analysis attached, cached if it is complete (see _analysis_result)."""
+    result, complete = _analysis_result(video["title"], request, response)
+    if complete:
+        get_summary_cache().put(
+            _summary_cache_key(video), video["video_id"], SUMMARY_PROMPT_VERSION, result
+        )
 
     return {
         **video,
@@ -166,38 +590,499 @@ def summarize_video(video: dict) -> dict:
     }
 
 
-def generate_overall_digest(analyzed_videos: list[dict]) -> dict:
-    """Generate an overall market digest synthesizing all video summaries."""
-    summaries = []
+def _transcript_sample(text: str, max_tokens: int) -> str:
+    """The start and end of a transcript, ~max_tokens in total, cut on word boundaries."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    half = max_tokens * 4 // 2
+    head = text[:half].rsplit(" ", 1)[0]
+    tail = text[-half:].split(" ", 1)[-1]
+    return f"{head} [...] {tail}"
+
+
+def triage_video(video: dict) -> Triage:
+    """Ask TRIAGE_MODEL whether a video is worth a full summary, from a transcript sample.
+
+    Fails open: an API error or unusable reply keeps the video. Verdicts are not
+    cached, but a kept video is not triaged again once its summary is cached.
+    """
+    prompt = TRIAGE_PROMPT.format(
+        title=video["title"],
+        channel=video["channel"],
+        sample=_transcript_sample(video["transcript"], TRIAGE_SAMPLE_TOKENS),
+    )
+    request = {
+        "model": TRIAGE_MODEL,
+        "max_tokens": 256,
+        "tools": [TRIAGE_TOOL],
+        "tool_choice": {"type": "tool", "name": TRIAGE_TOOL["name"]},
+        "messages": [{"role": "user", "content": prompt}],
+    }
+    try:
+        response = _create_message(stage="triage", timeout=TRIAGE_TIMEOUT_SECONDS, **request)
+    except anthropic.APIError as e:
+        print(f"    Triage failed ({e.__class__.__name__}), summarizing anyway")
+        return Triage.keep("triage failed")
+
+    fields, errors = validate(_tool_input(response, TRIAGE_TOOL), TRIAGE_SCHEMA)
+    if errors:
+        return Triage.keep("unusable triage reply")
+    return Triage(**fields)
+
+
+def _triaged(video: dict) -> dict:
+    """The video with its triage verdict attached (as "triage")."""
+    return {
+        **video,
+        "triage": triage_video(video).to_dict(),
+    }
+
+
+def _triage_skips(video: dict) -> bool:
+    return Triage(**video["triage"]).skip if "triage" in video else False
+
+
+def _skipped(video: dict) -> dict:
+    """Result for a video triage skipped: an empty analysis (sponsored if that was the verdict)."""
+    analysis = Analysis.empty()
+    analysis.is_sponsored = video["triage"]["verdict"] == "sponsored"
+    return {
+        **video,
+        "analysis": analysis.to_dict(),
+    }
+
+
+def _summarize_chunked(video: dict, chunks: list[str]) -> dict:
+    """Map-reduce summary: analyze transcript chunks in parallel, then merge them."""
+    print(f"    Long transcript: summarizing in {len(chunks)} parts")
+
+    def analyze_part(numbered_chunk):
+        part, chunk = numbered_chunk
+        prompt = VIDEO_CHUNK_PROMPT.format(
+            title=video["title"],
+            channel=video["channel"],
+            part=part,
+            parts=len(chunks),
+            transcript=chunk,
+        )
+        return _analysis_result(f"{video['title']} (part {part})", _analysis_request(prompt))[0]
+
+    with ThreadPoolExecutor(max_workers=max(1, SUMMARY_CONCURRENCY)) as pool:
+        partials = pool_map(pool, analyze_part, enumerate(chunks, start=1))
+
+    prompt = VIDEO_MERGE_PROMPT.format(
+        title=video["title"],
+        channel=video["channel"],
+        parts=len(chunks),
+        analyses_json=json.dumps(partials, indent=1),
+    )
+    return _summary_result(video, _analysis_request(prompt, max_tokens=3000))
+
+
+def _cached_summary(video: dict):
+    """Return the video with its cached analysis attached, or None on a cache miss."""
+    cached = get_summary_cache().get(_summary_cache_key(video))
+    if cached is None:
+        return None
+    return {
+        **video,
+        "analysis": cached,
+    }
+
+
+def summarize_video(video: dict) -> dict:
+    """Summarize a single video transcript using Claude.
+
+    Unless the summary is cached, the video is triaged first (see triage_video) and
+    a skipped video gets an empty analysis; its verdict is attached as "triage".
+    """
+    result = _cached_summary(video)
+    if result is not None:
+        print(f"    (cached summary)")
+    else:
+        if TRIAGE_ENABLED and "triage" not in video:
+            video = _triaged(video)
+        if _triage_skips(video):
+            print(f"    Triage: {video['triage']['verdict']} ({video['triage']['reason']})")
+            result = _skipped(video)
+    if result is not None:
+        return result
+
+    chunks = _split_transcript(video["transcript"], SUMMARY_CHUNK_TOKENS)
+    if len(chunks) > 1:
+        return _summarize_chunked(video, chunks)
+
+    return _summary_result(video, _summary_request(video))
+
+
+def _summarize_or_none(video: dict):
+    """summarize_video, but a failure only drops this one video."""
+    print(f"  Analyzing: {video['title']}")
+    try:
+        with span("summarize", video_id=video["video_id"]):
+            return summarize_video(video)
+    except Exception as e:
+        print(f"  Error summarizing '{video['title']}': {e}")
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Near-duplicates — clips and re-uploads reuse the summary of the full video
+# ---------------------------------------------------------------------------
+
+def _link(video: dict, canonical: dict, result: dict) -> dict:
+    """Result for a near-duplicate: `result` (the canonical video's) with this video's details."""
+    linked = {
+        **video,
+        "analysis": result["analysis"],
+        "duplicate_of": {key: canonical[key] for key in ("video_id", "title", "channel")},
+    }
+    if "triage" in result:
+        linked["triage"] = result["triage"]
+    return linked
+
+
+def _register(index: DuplicateIndex, video: dict, links: dict) -> Optional[dict]:
+    """Check `video` against the duplicate index before it is summarized.
+
+    Returns the linked result for a duplicate of a video summarized in an earlier
+    run (if that summary is still cached). A duplicate of a video from this run is
+    recorded in `links` (video_id -> canonical video_id) instead, as is every
+    earlier video of this run that `video` turns out to contain (such a video
+    keeps its own summary if it has one by then, see _resolve_links). Otherwise
+    `video` becomes canonical and None is returned.
+    """
+    canonical = index.find(video)
+    if canonical is not None and "summary_key" in canonical:
+        cached = get_summary_cache().get(canonical["summary_key"])
+        if cached is not None:
+            print(f"  Duplicate of '{canonical['title']}' (earlier run): {video['title']}")
+            return _link(video, canonical, {"analysis": cached})
+        canonical = None
+    if canonical is not None:
+        print(f"  Duplicate of '{canonical['title']}': {video['title']}")
+        links[video["video_id"]] = canonical["video_id"]
+        return None
+
+    for contained in index.add(video):
+        print(f"  '{contained['title']}' is part of '{video['title']}'")
+        links[contained["video_id"]] = video["video_id"]
+    return None
+
+
+def _resolve_links(videos: list[dict], done: dict, links: dict, index: DuplicateIndex) -> None:
+    """Fill in `done` (video_id -> result) for the videos in `links` from their canonical
+    videos' results, and remember this run's summarized canonical videos.
+
+    A video that was already summarized before the video containing it turned up
+    keeps its own summary (it was paid for). A duplicate whose canonical video
+    failed is summarized itself after all.
+    """
+    by_id = {v["video_id"]: v for v in videos}
+
+    def canonical_of(video_id):
+        while video_id in links:
+            video_id = links[video_id]
+        return video_id
+
+    orphans = []
+    linked = set()
+    for video_id in links:
+        if done.get(video_id) is not None:
+            continue
+        canonical = done.get(canonical_of(video_id))
+        if canonical is None:
+            orphans.append(by_id[video_id])
+            continue
+        done[video_id] = _link(by_id[video_id], canonical, canonical)
+        linked.add(video_id)
+    for video in orphans:
+        done[video["video_id"]] = _summarize_or_none(video)
+
+    for video_id, result in done.items():
+        if (result is not None and video_id not in linked and "duplicate_of" not in result
+                and not _triage_skips(result)):
+            index.remember(result, _summary_cache_key(result))
+
+
+def summarize_videos(videos: Iterable[dict], dedupe: bool = DEDUP_ENABLED) -> list[dict]:
+    """Summarize videos with up to SUMMARY_CONCURRENCY Claude calls in flight.
+
+    `videos` may be a generator: each video is submitted as soon as it is yielded,
+    so summarization overlaps with whatever produces them. With `dedupe`, a
+    near-duplicate of another video (see dedup.py) is not summarized; it gets that
+    video's analysis and "duplicate_of". Results keep the input order; videos whose
+    summary failed are left out.
+    """
+    index = DuplicateIndex() if dedupe else None
+    seen = []
+    done = {}
+    links = {}
+    with ThreadPoolExecutor(max_workers=max(1, SUMMARY_CONCURRENCY)) as pool:
+        futures = {}
+        for video in videos:
+            seen.append(video)
+            if index is not None:
+                linked = _register(index, video, links)
+                if linked is not None:
+                    done[video["video_id"]] = linked
+                    continue
+                if video["video_id"] in links:
+                    continue
+            futures[video["video_id"]] = submit(pool, _summarize_or_none, video)
+    done.update((video_id, f.result()) for video_id, f in futures.items())
+
+    if index is not None:
+        _resolve_links(seen, done, links, index)
+    results = [done.get(v["video_id"]) for v in seen]
+    return [r for r in results if r is not None]
+
+
+# ---------------------------------------------------------------------------
+# Message Batches mode — half the price, results within minutes to hours
+# ---------------------------------------------------------------------------
+
+def _wait_for_batch(batch_id: str):
+    """Poll a message batch with backoff until it ends. Returns None on timeout."""
+    deadline = time.monotonic() + BATCH_TIMEOUT_MINUTES * 60
+    delay = BATCH_POLL_INITIAL_SECONDS
+    while True:
+        batch = _with_retries(lambda: client.messages.batches.retrieve(batch_id))
+        if batch.processing_status == "ended":
+            return batch
+        counts = batch.request_counts
+        print(f"  Batch {batch_id}: {counts.processing} processing, {counts.succeeded} succeeded")
+        if time.monotonic() + delay > deadline:
+            return None
+        time.sleep(delay)
+        delay = min(delay * 2, BATCH_POLL_MAX_SECONDS)
+
+
+def _run_batch(pending: list[dict], done: dict) -> None:
+    """Summarize `pending` as one message batch, adding results to `done` by video_id."""
+    with span("claude.batch", model=CLAUDE_MODEL, requests=len(pending)):
+        print(f"  Submitting {len(pending)} video(s) as a message batch...")
+        by_id = {v["video_id"]: v for v in pending}
+        requests = [
+            {"custom_id": video_id, "params": _summary_request(video)}
+            for video_id, video in by_id.items()
+        ]
+        batch = _with_retries(lambda: client.messages.batches.create(requests=requests))
+
+        if _wait_for_batch(batch.id) is None:
+            print(f"  Batch {batch.id} timed out, cancelling and summarizing directly")
+            _with_retries(lambda: client.messages.batches.cancel(batch.id))
+            for result in summarize_videos(pending, dedupe=False):
+                done[result["video_id"]] = result
+            return
+
+        # Read in one go, so that a dropped connection can be retried from the start
+        entries = _with_retries(lambda: list(client.messages.batches.results(batch.id)))
+        for entry in entries:
+            video = by_id.get(entry.custom_id)
+            if video is None:
+                continue
+            if entry.result.type != "succeeded":
+                print(f"  Error summarizing '{video['title']}': batch result {entry.result.type}")
+                continue
+            usage.add(entry.result.message.usage, "summary", entry.result.message.model, batch=True)
+            done[entry.custom_id] = _summary_result(video, _summary_request(video), entry.result.message)
+
+
+def summarize_videos_batch(videos: list[dict]) -> list[dict]:
+    """Summarize videos through the Message Batches API.
+
+    Cached summaries are reused and near-duplicates are linked (longest transcripts
+    first, so those become the canonical videos). The rest are triaged (directly,
+    not in the batch) and long transcripts are summarized directly; the remaining
+    videos are sent as one batch with the video_id as custom_id. If the batch does
+    not finish within BATCH_TIMEOUT_MINUTES it is cancelled and those videos are
+    summarized synchronously.
+    """
+    done = {}
+    uncached = []
+    for video in videos:
+        cached = _cached_summary(video)
+        if cached is not None:
+            done[video["video_id"]] = cached
+        else:
+            uncached.append(video)
+
+    index = DuplicateIndex() if DEDUP_ENABLED else None
+    links = {}
+    if index is not None:
+        for video in sorted(uncached, key=lambda v: len(v["transcript"]), reverse=True):
+            linked = _register(index, video, links)
+            if linked is not None:
+                done[video["video_id"]] = linked
+        uncached = [v for v in uncached if v["video_id"] not in done and v["video_id"] not in links]
+
+    if TRIAGE_ENABLED and uncached:
+        with span("triage", videos=len(uncached)):
+            with ThreadPoolExecutor(max_workers=max(1, SUMMARY_CONCURRENCY)) as pool:
+                uncached = pool_map(pool, _triaged, uncached)
+
+    pending = []
+    long_videos = []
+    for video in uncached:
+        if _triage_skips(video):
+            print(f"  Triage: {video['triage']['verdict']} ({video['triage']['reason']}): {video['title']}")
+            done[video["video_id"]] = _skipped(video)
+        elif estimate_tokens(video["transcript"]) > SUMMARY_CHUNK_TOKENS:
+            long_videos.append(video)
+        else:
+            pending.append(video)
+
+    # Map-reduce summaries need the chunk results before the merge call, so
+    # long transcripts are summarized directly instead of in the batch
+    for result in summarize_videos(long_videos, dedupe=False):
+        done[result["video_id"]] = result
+
+    if pending:
+        _run_batch(pending, done)
+
+    if index is not None:
+        _resolve_links(videos, done, links, index)
+    return [done[v["video_id"]] for v in videos if v["video_id"] in done]
+
+
+def _compact_json(value) -> str:
+    """JSON without indentation or spaces, to keep prompts small."""
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _pack(blocks: list[list], max_tokens: int) -> list[list]:
+    """Concatenate consecutive blocks of items into groups of at most ~max_tokens.
+
+    Sizes are estimated from the items' compact JSON. A block that is too big on
+    its own is split between groups item by item.
+    """
+    groups = []
+    current = []
+    size = 0
+    for block in blocks:
+        if estimate_tokens(_compact_json(block)) > max_tokens:
+            parts = [[item] for item in block]
+        else:
+            parts = [block]
+        for part in parts:
+            tokens = estimate_tokens(_compact_json(part))
+            if current and size + tokens > max_tokens:
+                groups.append(current)
+                current = []
+                size = 0
+            current.extend(part)
+            size += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _digest_call(prompt: str, max_tokens: int) -> dict:
+    """Validated digest dict for a digest or merge prompt (unrepairable fields left empty)."""
+    request = {
+        "model": DIGEST_MODEL,
+        "max_tokens": max_tokens,
+        "tools": [DIGEST_TOOL],
+        "tool_choice": {"type": "tool", "name": DIGEST_TOOL["name"]},
+        "messages": [{"role": "user", "content": prompt}],
+    }
+    fields, _, _ = _structured(request, DIGEST_TOOL, "digest", stage="digest")
+    return Digest.from_fields({**Digest.empty().to_dict(), **fields}).to_dict()
+
+
+def _prior_context(videos: list[dict], aggregates: list[dict], profile: str) -> dict:
+    """Earlier history of the top tickers (see AnalysisHistory.prior_context), without these videos."""
+    if not HISTORY_ENABLED or HISTORY_CONTEXT_DAYS <= 0:
+        return {}
+    with span("history.context"):
+        return get_history().prior_context(
+            [e["symbol"] for e in aggregates],
+            HISTORY_CONTEXT_DAYS,
+            HISTORY_CONTEXT_ROWS,
+            exclude={v["video_id"] for v in videos},
+            profile=profile,
+        )
+
+
+def _digest_group(summaries: list[dict], context: dict) -> dict:
+    """Digest a group of video summaries; tickers go in as the aggregated table, with
+    the earlier context of the group's top tickers."""
+    aggregates = aggregate_tickers(summaries)
+    symbols = [e["symbol"] for e in aggregates[:TOP_TICKERS]]
+    group_context = dict(context)
+    tickers = {s: context["tickers"][s] for s in symbols if s in context.get("tickers", {})}
+    group_context.pop("tickers", None)
+    if tickers:
+        group_context["tickers"] = tickers
+    prompt = DIGEST_PROMPT.format(
+        summaries_json=_compact_json([
+            {**s, "analysis": {k: v for k, v in s["analysis"].items() if k != "tickers"}}
+            for s in summaries
+        ]),
+        tickers_json=_compact_json(ticker_table(aggregates)),
+        history_json=_compact_json(group_context) if group_context else "(none)",
+        note_symbols=", ".join(symbols) or "(none)",
+    )
+    return _digest_call(prompt, max_tokens=2500)
+
+
+def _merge_digests(digests: list[dict], note_symbols: str) -> dict:
+    if len(digests) == 1:
+        return digests[0]
+    prompt = DIGEST_MERGE_PROMPT.format(
+        parts=len(digests), digests_json=_compact_json(digests), note_symbols=note_symbols
+    )
+    return _digest_call(prompt, max_tokens=3000)
+
+
+def _with_tickers(digest: dict, aggregates: list[dict]) -> dict:
+    """Fill in top_tickers and key_levels_to_watch from the local aggregation."""
+    notes = {normalize_symbol(symbol): note for symbol, note in digest.pop("ticker_notes").items()}
+    digest["top_tickers"] = top_tickers(aggregates, notes)
+    digest["key_levels_to_watch"] = key_levels(aggregates)
+    return digest
+
+
+def generate_overall_digest(analyzed_videos: list[dict], profile: str = DEFAULT_PROFILE) -> dict:
+    """Generate an overall market digest synthesizing all video summaries.
+
+    Ticker mention counts, sentiment and price levels are aggregated locally
+    (see aggregator.py); Claude writes the narrative. Small days take a single
+    call. Otherwise the summaries are grouped by channel into
+    DIGEST_CHUNK_TOKENS-sized groups that are digested in parallel, and the
+    partial digests are merged level by level until one is left.
+
+    With HISTORY_ENABLED, each group also gets earlier mentions of its top
+    tickers and the recipient profile's last overview from the history (see
+    history.py).
+    """
+    aggregates = aggregate_tickers(analyzed_videos)
+    context = _prior_context(analyzed_videos, aggregates[:TOP_TICKERS], profile)
+
+    by_channel = {}
     for v in analyzed_videos:
-        summaries.append({
+        by_channel.setdefault(v["channel"], []).append({
             "channel": v["channel"],
             "title": v["title"],
             "analysis": v["analysis"],
         })
 
-    prompt = DIGEST_PROMPT.format(summaries_json=json.dumps(summaries, indent=2))
-
-    response = client.messages.create(
-        model=CLAUDE_MODEL,
-        max_tokens=2500,
-        messages=[{"role": "user", "content": prompt}],
-    )
+    groups = _pack(list(by_channel.values()), DIGEST_CHUNK_TOKENS) or [[]]
+    if len(groups) == 1:
+        return _with_tickers(_digest_group(groups[0], context), aggregates)
 
-    raw_text = response.content[0].text
-    cleaned = _clean_json_response(raw_text)
-
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        print("  Warning: Could not parse digest JSON, using raw text")
-        return {
-            "market_overview": cleaned[:500],
-            "consensus_themes": [],
-            "conflicting_views": [],
-            "top_tickers": [],
-            "key_levels_to_watch": [],
-            "action_items": [],
-            "risk_alerts": [],
-            "upcoming_catalysts": [],
-        }
+    note_symbols = ", ".join(e["symbol"] for e in aggregates[:TOP_TICKERS])
+    print(f"  {len(analyzed_videos)} summaries: digesting {len(groups)} channel groups in parallel")
+    with ThreadPoolExecutor(max_workers=max(1, SUMMARY_CONCURRENCY)) as pool:
+        digests = pool_map(pool, lambda group: _digest_group(group, context), groups)
+        level = 1
+        while len(digests) > 1:
+            groups = _pack([[d] for d in digests], DIGEST_CHUNK_TOKENS)
+            if len(groups) == len(digests):
+                # Every partial digest fills the budget alone; merge them in pairs
+                groups = [digests[i:i + 2] for i in range(0, len(digests), 2)]
+            level += 1
+            print(f"  Merging {len(digests)} partial digests into {len(groups)} (level {level})")
+            digests = pool_map(pool, lambda group: _merge_digests(group, note_symbols), groups)
+    return _with_tickers(digests[0], aggregates)
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Optional
+
+from config import RUN_REPORT_PATH
+
+# Optional OpenTelemetry export, enabled by the standard OTLP endpoint variable
+# (e.g. OTEL_EXPORTER_OTLP_ENDPOINT=http://localhost:4318 for a local collector)
+_tracer = None
+_tracer_provider = None
+if os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"):
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        _tracer_provider = TracerProvider(resource=Resource.create({"service.name": "youtube-digest"}))
+        _tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        _tracer = _tracer_provider.get_tracer("youtube-digest")
+    except ImportError:
+        print("OpenTelemetry packages not installed, skipping trace export")
+
+
+class Span:
+    """One timed stage of the run. Numeric attributes added with add() are summed."""
+
+    def __init__(self, span_id: int, name: str, parent_id: Optional[int], attrs: dict):
+        self.id = span_id
+        self.name = name
+        self.parent_id = parent_id
+        self.attrs = dict(attrs)
+        self.thread = threading.current_thread().name
+        self.started_at = time.time()
+        self.duration = None
+        self._lock = threading.Lock()
+
+    def set(self, **attrs) -> None:
+        with self._lock:
+            self.attrs.update(attrs)
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for key, value in counts.items():
+                self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "thread": self.thread,
+            "start": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "seconds": round(self.duration, 4),
+            **self.attrs,
+        }
+
+
+_ids = itertools.count(1)
+_current = contextvars.ContextVar("current_span", default=None)
+_finished = []
+_finished_lock = threading.Lock()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block of work as a span nested under the current one (see submit for pool workers)."""
+    parent = _current.get()
+    current = Span(next(_ids), name, parent.id if parent else None, attrs)
+    token = _current.set(current)
+    start = time.perf_counter()
+    otel = _tracer.start_as_current_span(name) if _tracer else nullcontext()
+    with otel as otel_span:
+        try:
+            yield current
+        except Exception as e:
+            current.set(error=repr(e))
+            raise
+        finally:
+            current.duration = time.perf_counter() - start
+            _current.reset(token)
+            if otel_span is not None:
+                otel_span.set_attributes({
+                    k: v for k, v in current.attrs.items() if isinstance(v, (str, bool, int, float))
+                })
+            with _finished_lock:
+                _finished.append(current)
+
+
+def record(**counts) -> None:
+    """Add numeric counts (bytes, tokens, quota units...) to the current span, if any."""
+    current = _current.get()
+    if current is not None:
+        current.add(**counts)
+
+
+def submit(pool: Executor, fn, *args) -> Future:
+    """pool.submit(fn, *args), run in a copy of the caller's context.
+
+    Worker threads start with an empty context, so without this the spans opened
+    by `fn` would not nest under the caller's current span.
+    """
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+def pool_map(pool: Executor, fn, items) -> list:
+    """[fn(item) for item in items] on `pool`, each call nested like submit()."""
+    return [future.result() for future in [submit(pool, fn, item) for item in items]]
+
+
+def build_report() -> dict:
+    """Per-stage totals (count, seconds, summed numeric attributes) plus every span."""
+    with _finished_lock:
+        spans = sorted(_finished, key=lambda s: s.started_at)
+
+    stages = {}
+    for s in spans:
+        stage = stages.setdefault(s.name, {"count": 0, "seconds": 0.0})
+        stage["count"] += 1
+        stage["seconds"] = round(stage["seconds"] + s.duration, 4)
+        for key, value in s.attrs.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                stage[key] = stage.get(key, 0) + value
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "stages": stages,
+        "spans": [s.to_dict() for s in spans],
+    }
+
+
+def write_report(path: str = RUN_REPORT_PATH) -> None:
+    """Write the JSON run report and flush any OpenTelemetry export."""
+    report = build_report()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Run report written to {path}")
+
+    if _tracer_provider is not None:
+        _tracer_provider.shutdown()
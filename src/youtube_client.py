@@ -3,52 +3,305 @@ from __future__ import annotations
 import os
 import re
 import tempfile
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Iterator, Optional
 
 from googleapiclient.discovery import build
 from youtube_transcript_api import YouTubeTranscriptApi
 
-from config import YOUTUBE_API_KEY, LOOKBACK_HOURS, MAX_VIDEOS_PER_CHANNEL
+from cache import get_channel_state, get_layer_health_store, get_transcript_cache
+from captions import CAPTION_EXTENSIONS, parse_caption_file, parse_captions, parse_vtt
+from config import (
+    YOUTUBE_API_KEY,
+    LOOKBACK_HOURS,
+    MAX_VIDEOS_PER_CHANNEL,
+    FETCH_CONCURRENCY,
+    YOUTUBE_REQUESTS_PER_SECOND,
+    POLL_MODE,
+    YTDLP_IN_MEMORY,
+    LAYER_SKIP_AFTER_FAILURES,
+    LAYER_PROBE_EVERY,
+    HEDGE_AFTER_SECONDS,
+)
+from telemetry import record, span, submit
 
-# Delay between transcript requests to reduce rate-limiting risk
-REQUEST_DELAY_SECONDS = 3
+YOUTUBE_HOST = "www.youtube.com"
+DATA_API_HOST = "www.googleapis.com"
+
+# The Data API is quota-limited rather than IP-blocked, so it gets a looser rate
+DATA_API_REQUESTS_PER_SECOND = 5.0
+
+# Caption languages tried by the yt-dlp fallback, in order
+SUBTITLE_LANGS = ["en", "en-US", "en-GB"]
+
+# videos.list accepts at most 50 ids per call
+VIDEOS_LIST_MAX_IDS = 50
+
+_DURATION_RE = re.compile(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?")
+
+
+# ---------------------------------------------------------------------------
+# Per-host rate limiting (shared across fetch workers)
+# ---------------------------------------------------------------------------
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self) -> float:
+        """Block until a token is available, then consume it. Returns the seconds waited."""
+        with self._lock:
+            self._refill()
+            # Reserve the token up front so waiting callers queue in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def empty(self) -> bool:
+        """True if the next acquire() would have to wait."""
+        with self._lock:
+            self._refill()
+            return self._tokens < 1
+
+
+_RATE_LIMITERS = {
+    YOUTUBE_HOST: TokenBucket(YOUTUBE_REQUESTS_PER_SECOND),
+    DATA_API_HOST: TokenBucket(DATA_API_REQUESTS_PER_SECOND, capacity=5),
+}
+
+
+# Seconds this thread has spent waiting in _throttle, so layer latencies can
+# leave out the time spent queueing for the rate limiter
+_throttle_wait = threading.local()
+
+
+def _throttle(host: str) -> None:
+    """Wait for the rate limiter of `host` before sending a request to it."""
+    waited = _RATE_LIMITERS[host].acquire()
+    _throttle_wait.seconds = _throttled_seconds() + waited
+
+
+def _throttled_seconds() -> float:
+    return getattr(_throttle_wait, "seconds", 0.0)
+
+
+# ---------------------------------------------------------------------------
+# Shared YouTube Data API client
+# ---------------------------------------------------------------------------
+
+_youtube_service = None
+_youtube_lock = threading.Lock()
+
+
+def _youtube():
+    """Process-wide YouTube Data API client, so the discovery document is loaded once."""
+    global _youtube_service
+    with _youtube_lock:
+        if _youtube_service is None:
+            _youtube_service = build("youtube", "v3", developerKey=YOUTUBE_API_KEY, cache_discovery=False)
+    return _youtube_service
+
+
+def _execute(request, quota_units: int = 1) -> dict:
+    """Execute a Data API request, recording its quota cost on the current span.
+
+    The underlying httplib2 connection is not thread-safe, so requests from fetch
+    workers are serialized.
+    """
+    _throttle(DATA_API_HOST)
+    record(quota_units=quota_units)
+    with _youtube_lock:
+        return request.execute()
+
+
+# ---------------------------------------------------------------------------
+# Finding new videos
+# ---------------------------------------------------------------------------
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parse an RFC 3339 timestamp as returned by the YouTube Data API."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _video_entry(video_id: str, snippet: dict, published_at: str) -> dict:
+    return {
+        "video_id": video_id,
+        "title": snippet["title"],
+        "channel": snippet["channelTitle"],
+        "channel_id": snippet["channelId"],
+        "published_at": published_at,
+        "description": snippet.get("description", ""),
+        "url": f"https://www.youtube.com/watch?v={video_id}",
+    }
+
+
+def _search_channel(youtube, channel_id: str, cutoff: datetime) -> list[dict]:
+    """New videos via search.list (100 quota units per call)."""
+    response = _execute(youtube.search().list(
+        part="snippet",
+        channelId=channel_id,
+        publishedAfter=cutoff.isoformat(),
+        order="date",
+        type="video",
+        maxResults=MAX_VIDEOS_PER_CHANNEL,
+    ), quota_units=100)
+
+    return [
+        _video_entry(item["id"]["videoId"], item["snippet"], item["snippet"]["publishedAt"])
+        for item in response.get("items", [])
+    ]
+
+
+def _poll_uploads(youtube, channel_id: str, cutoff: datetime) -> list[dict]:
+    """New videos via the channel's uploads playlist (1 quota unit per call).
+
+    Only videos newer than both the cutoff and the channel's high-water mark, and
+    not marked seen, are returned, so a video that already went out in a digest is
+    not picked up again.
+    """
+    state = get_channel_state()
+    mark = state.get(channel_id)
+    if mark is not None:
+        cutoff = max(cutoff, _parse_timestamp(mark[0]))
+    seen = state.seen(channel_id)
+
+    # Every channel's uploads playlist id is its channel id with "UC" -> "UU"
+    response = _execute(youtube.playlistItems().list(
+        part="snippet,contentDetails",
+        playlistId="UU" + channel_id[2:],
+        maxResults=min(MAX_VIDEOS_PER_CHANNEL, 50),
+    ))
+
+    videos = []
+    for item in response.get("items", []):
+        # Private and deleted videos have no videoPublishedAt
+        published_at = item["contentDetails"].get("videoPublishedAt")
+        if not published_at or _parse_timestamp(published_at) <= cutoff:
+            continue
+        if item["contentDetails"]["videoId"] in seen:
+            continue
+        videos.append(_video_entry(item["contentDetails"]["videoId"], item["snippet"], published_at))
+    return videos
 
 
 def get_new_videos(channel_ids: list[str]) -> list[dict]:
     """Fetch videos published in the last LOOKBACK_HOURS from the given channels."""
-    youtube = build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
+    youtube = _youtube()
     cutoff = datetime.now(timezone.utc) - timedelta(hours=LOOKBACK_HOURS)
-    published_after = cutoff.isoformat()
+    poll_channel = _poll_uploads if POLL_MODE == "uploads" else _search_channel
 
     videos = []
     for channel_id in channel_ids:
         try:
-            response = youtube.search().list(
-                part="snippet",
-                channelId=channel_id,
-                publishedAfter=published_after,
-                order="date",
-                type="video",
-                maxResults=MAX_VIDEOS_PER_CHANNEL,
-            ).execute()
-
-            for item in response.get("items", []):
-                videos.append({
-                    "video_id": item["id"]["videoId"],
-                    "title": item["snippet"]["title"],
-                    "channel": item["snippet"]["channelTitle"],
-                    "published_at": item["snippet"]["publishedAt"],
-                    "description": item["snippet"].get("description", ""),
-                    "url": f"https://www.youtube.com/watch?v={item['id']['videoId']}",
-                })
+            with span("youtube.poll", channel_id=channel_id, mode=POLL_MODE) as poll:
+                found = poll_channel(youtube, channel_id, cutoff)
+                poll.set(videos=len(found))
+            videos.extend(found)
         except Exception as e:
             print(f"Error fetching videos for channel {channel_id}: {e}")
 
     return videos
 
 
+def _parse_duration(value: str) -> int:
+    """Seconds in an ISO 8601 duration such as "PT1H2M3S" (0 if unparseable)."""
+    match = _DURATION_RE.fullmatch(value or "")
+    if not match:
+        return 0
+    days, hours, minutes, seconds = (int(g) if g else 0 for g in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def enrich_videos(videos: list[dict]) -> list[dict]:
+    """Attach full metadata from batched videos.list calls (up to 50 ids, 1 quota unit each).
+
+    Adds full_description to each video. Live and upcoming streams and videos with
+    no duration yet (premieres and uploads still processing) are dropped before any
+    transcript is fetched, since they have no captions yet, as are videos the API
+    no longer returns (deleted or made private).
+    """
+    youtube = _youtube()
+    details = {}
+    for start in range(0, len(videos), VIDEOS_LIST_MAX_IDS):
+        ids = [v["video_id"] for v in videos[start:start + VIDEOS_LIST_MAX_IDS]]
+        try:
+            with span("youtube.enrich", videos=len(ids)):
+                response = _execute(youtube.videos().list(
+                    part="snippet,contentDetails",
+                    id=",".join(ids),
+                    maxResults=VIDEOS_LIST_MAX_IDS,
+                ))
+        except Exception as e:
+            # Keep these videos unenriched rather than losing them
+            print(f"Error fetching video details: {e}")
+            details.update((video_id, None) for video_id in ids)
+            continue
+        for item in response.get("items", []):
+            details[item["id"]] = item
+
+    enriched = []
+    for video in videos:
+        if video["video_id"] not in details:
+            print(f"  - {video['channel']}: {video['title']} (no longer available)")
+            continue
+        item = details[video["video_id"]]
+        if item is not None:
+            live = item["snippet"].get("liveBroadcastContent", "none")
+            if live in ("live", "upcoming"):
+                print(f"  - {video['channel']}: {video['title']} (stream is {live})")
+                continue
+            if not _parse_duration(item["contentDetails"].get("duration")):
+                print(f"  - {video['channel']}: {video['title']} (no duration yet)")
+                continue
+            video["full_description"] = item["snippet"].get("description", "")
+        enriched.append(video)
+    return enriched
+
+
+def mark_videos_seen(videos: list[dict], found: list[dict]) -> None:
+    """Record the `videos` that went out in a digest, out of the `found` ones polled.
+
+    A channel's high-water mark only advances to just below its oldest found video
+    that did not go out (no transcript yet, failed summary, live stream), so that
+    one is polled again; newer videos that did go out are skipped by id instead.
+    """
+    state = get_channel_state()
+    done = {v["video_id"] for v in videos}
+    oldest_pending = {}
+    for video in found:
+        if video["video_id"] in done:
+            continue
+        channel_id = video["channel_id"]
+        if channel_id not in oldest_pending or video["published_at"] < oldest_pending[channel_id]:
+            oldest_pending[channel_id] = video["published_at"]
+
+    for video in videos:
+        state.mark_seen(video["channel_id"], video["video_id"], video["published_at"])
+        pending = oldest_pending.get(video["channel_id"])
+        if pending is None or video["published_at"] < pending:
+            state.advance(video["channel_id"], video["published_at"], video["video_id"])
+
+    # Videos from before the lookback window are never returned by a poll again
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=LOOKBACK_HOURS)
+    state.forget_before(cutoff.strftime("%Y-%m-%dT%H:%M:%SZ"))
+
+
 # ---------------------------------------------------------------------------
 # Layer 1: youtube-transcript-api (v1.2.4 — innertube-based, most lightweight)
 # ---------------------------------------------------------------------------
@@ -59,6 +312,7 @@ def _fetch_via_transcript_api(video_id: str) -> Optional[str]:
 
     # Try English captions (manual or auto-generated)
     try:
+        _throttle(YOUTUBE_HOST)
         transcript = ytt.fetch(video_id, languages=["en"])
         snippets = transcript.to_raw_data()
         text = " ".join(s["text"] for s in snippets)
@@ -69,9 +323,11 @@ def _fetch_via_transcript_api(video_id: str) -> Optional[str]:
 
     # Try any available language
     try:
+        _throttle(YOUTUBE_HOST)
         transcript_list = ytt.list(video_id)
         for t in transcript_list:
             try:
+                _throttle(YOUTUBE_HOST)
                 fetched = t.fetch()
                 snippets = fetched.to_raw_data()
                 text = " ".join(s["text"] for s in snippets)
@@ -90,34 +346,69 @@ def _fetch_via_transcript_api(video_id: str) -> Optional[str]:
 # Layer 2: yt-dlp subtitle extraction (different code path, may bypass blocks)
 # ---------------------------------------------------------------------------
 
+_ytdlp_local = threading.local()
+
+
 def _parse_vtt(vtt_text: str) -> str:
     """Extract plain text from a WebVTT subtitle file."""
-    lines = []
-    for line in vtt_text.splitlines():
-        # Skip VTT headers, timestamps, and blank lines
-        line = line.strip()
-        if not line:
-            continue
-        if line.startswith("WEBVTT"):
-            continue
-        if line.startswith("Kind:") or line.startswith("Language:"):
-            continue
-        if "-->" in line:
-            continue
-        if re.match(r"^\d+$", line):
-            continue
-        # Remove VTT formatting tags like <c> </c> <00:00:01.234>
-        clean = re.sub(r"<[^>]+>", "", line)
-        if clean.strip():
-            lines.append(clean.strip())
+    return parse_vtt(vtt_text.splitlines())
+
+
+def _ytdlp():
+    """This worker thread's YoutubeDL instance, created on first use and then reused.
+
+    YoutubeDL is not thread-safe, so each fetch worker keeps its own.
+    """
+    ydl = getattr(_ytdlp_local, "ydl", None)
+    if ydl is None:
+        import yt_dlp
+
+        ydl = yt_dlp.YoutubeDL({"skip_download": True, "quiet": True, "no_warnings": True})
+        _ytdlp_local.ydl = ydl
+    return ydl
+
+
+def _pick_caption_track(info: dict) -> Optional[tuple[str, str, str]]:
+    """Choose (lang, format, url) of the best English caption track in an info dict.
+
+    Uploaded subtitles win over auto-generated ones, and json3 over vtt.
+    """
+    for source in ("subtitles", "automatic_captions"):
+        tracks = info.get(source) or {}
+        for lang in SUBTITLE_LANGS:
+            by_format = {t.get("ext"): t for t in tracks.get(lang) or []}
+            for fmt in ("json3", "vtt"):
+                if fmt in by_format:
+                    return lang, fmt, by_format[fmt]["url"]
+    return None
+
+
+def _fetch_via_ytdlp_in_memory(video_id: str) -> Optional[str]:
+    """Read caption track URLs from yt-dlp's metadata and download the best one into memory."""
+    ydl = _ytdlp()
+    url = f"https://www.youtube.com/watch?v={video_id}"
 
-    # Deduplicate consecutive identical lines (VTT often repeats)
-    deduped = []
-    for line in lines:
-        if not deduped or line != deduped[-1]:
-            deduped.append(line)
+    try:
+        _throttle(YOUTUBE_HOST)
+        info = ydl.extract_info(url, download=False, process=False)
+        track = _pick_caption_track(info or {})
+        if track is None:
+            print("    [yt-dlp] No English captions listed")
+            return None
+        lang, fmt, track_url = track
+        _throttle(YOUTUBE_HOST)
+        # urlopen goes through yt-dlp's own request handlers, which keep connections alive
+        with ydl.urlopen(track_url) as response:
+            data = response.read().decode("utf-8")
+    except Exception as e:
+        print(f"    [yt-dlp] Caption download failed: {e}")
+        return None
 
-    return " ".join(deduped)
+    text = parse_captions(data, fmt)
+    if text.strip():
+        print(f"    [yt-dlp] Got {lang} {fmt} captions")
+        return text
+    return None
 
 
 def _fetch_via_ytdlp(video_id: str) -> Optional[str]:
@@ -128,6 +419,9 @@ def _fetch_via_ytdlp(video_id: str) -> Optional[str]:
         print("    [yt-dlp] Not installed, skipping fallback")
         return None
 
+    if YTDLP_IN_MEMORY:
+        return _fetch_via_ytdlp_in_memory(video_id)
+
     url = f"https://www.youtube.com/watch?v={video_id}"
 
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -137,27 +431,26 @@ def _fetch_via_ytdlp(video_id: str) -> Optional[str]:
             "skip_download": True,
             "writesubtitles": True,
             "writeautomaticsub": True,
-            "subtitleslangs": ["en", "en-US", "en-GB"],
-            "subtitlesformat": "vtt",
+            "subtitleslangs": SUBTITLE_LANGS,
+            # json3 carries clean per-word segments; fall back to vtt
+            "subtitlesformat": "json3/vtt",
             "outtmpl": output_template,
             "quiet": True,
             "no_warnings": True,
         }
 
         try:
+            _throttle(YOUTUBE_HOST)
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 ydl.download([url])
         except Exception as e:
             print(f"    [yt-dlp] Download failed: {e}")
             return None
 
-        # Look for any .vtt file that was written
+        # Look for any caption file that was written
         for fname in os.listdir(tmpdir):
-            if fname.endswith(".vtt"):
-                filepath = os.path.join(tmpdir, fname)
-                with open(filepath, "r", encoding="utf-8") as f:
-                    vtt_text = f.read()
-                text = _parse_vtt(vtt_text)
+            if fname.endswith(CAPTION_EXTENSIONS):
+                text = parse_caption_file(os.path.join(tmpdir, fname))
                 if text.strip():
                     print(f"    [yt-dlp] Got subtitles from {fname}")
                     return text
@@ -172,11 +465,10 @@ def _fetch_via_ytdlp(video_id: str) -> Optional[str]:
 def _get_full_description(video_id: str) -> Optional[str]:
     """Fetch the full video description via the videos.list API."""
     try:
-        youtube = build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
-        response = youtube.videos().list(
+        response = _execute(_youtube().videos().list(
             part="snippet",
             id=video_id,
-        ).execute()
+        ))
         items = response.get("items", [])
         if items:
             desc = items[0]["snippet"].get("description", "")
@@ -188,56 +480,257 @@ def _get_full_description(video_id: str) -> Optional[str]:
 
 
 # ---------------------------------------------------------------------------
-# Main transcript fetcher — tries all layers in order
+# Adaptive layer ordering — per-layer success/latency stats, persisted across runs
 # ---------------------------------------------------------------------------
 
-def get_transcript(video_id: str) -> Optional[str]:
-    """Fetch transcript using a 3-layer fallback strategy."""
-    print(f"  Fetching transcript for {video_id}...")
+# Caption layers in their default order; the description fallback always runs last
+CAPTION_LAYERS = ("transcript-api", "yt-dlp")
+
+# Starting assumptions for a layer with no history, and the EWMA weight of a new result
+_DEFAULT_HEALTH = (0.9, 3.0, 0)
+_EWMA_ALPHA = 0.2
+
+
+class LayerStats:
+    """Tracks how each caption layer is doing and decides which to try, in what order.
+
+    Keeps exponentially weighted success rate and latency (persisted between runs)
+    plus this run's raw counts and latencies for reporting and hedging decisions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.health = {}
+        self.attempts = {layer: 0 for layer in CAPTION_LAYERS}
+        self.successes = {layer: 0 for layer in CAPTION_LAYERS}
+        self.latencies = {layer: [] for layer in CAPTION_LAYERS}
+        self._planned = 0
+
+    def _load(self) -> None:
+        if not self._loaded:
+            stored = get_layer_health_store().load()
+            self.health = {layer: list(stored.get(layer, _DEFAULT_HEALTH)) for layer in CAPTION_LAYERS}
+            self._loaded = True
+
+    def plan(self) -> list[str]:
+        """Caption layers to try for the next video, best expected time-to-success first.
+
+        A layer on a streak of LAYER_SKIP_AFTER_FAILURES failures is left out. Every
+        LAYER_PROBE_EVERY-th video uses the default order with all layers instead, so
+        a layer that recovered (or was only unlucky) gets another chance.
+        """
+        with self._lock:
+            self._load()
+            self._planned += 1
+            if self._planned % LAYER_PROBE_EVERY == 0:
+                return list(CAPTION_LAYERS)
+            order = [
+                layer for layer in CAPTION_LAYERS
+                if self.health[layer][2] < LAYER_SKIP_AFTER_FAILURES
+            ]
+            order.sort(key=lambda layer: self.health[layer][1] / max(self.health[layer][0], 0.05))
+            return order
+
+    def record(self, layer: str, success: bool, seconds: float) -> None:
+        with self._lock:
+            self._load()
+            rate, latency, failures = self.health[layer]
+            self.health[layer] = [
+                rate + _EWMA_ALPHA * ((1.0 if success else 0.0) - rate),
+                latency + _EWMA_ALPHA * (seconds - latency),
+                0 if success else failures + 1,
+            ]
+            self.attempts[layer] += 1
+            self.successes[layer] += success
+            self.latencies[layer].append(seconds)
+
+    def p90_latency(self, layer: str) -> float:
+        """90th percentile latency of this run's attempts (smoothed latency if none yet)."""
+        with self._lock:
+            samples = sorted(self.latencies[layer])
+            if not samples:
+                self._load()
+                return self.health[layer][1]
+            return samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+
+    def save(self) -> None:
+        """Persist the smoothed stats so the next run starts from them."""
+        with self._lock:
+            if not self._loaded:
+                return
+            store = get_layer_health_store()
+            for layer, (rate, latency, failures) in self.health.items():
+                store.save(layer, rate, latency, failures)
+
+    def report(self) -> str:
+        with self._lock:
+            parts = []
+            for layer in CAPTION_LAYERS:
+                attempts = self.attempts[layer]
+                if attempts:
+                    mean = sum(self.latencies[layer]) / attempts
+                    parts.append(f"{layer} {self.successes[layer]}/{attempts} ok, {mean:.1f}s avg")
+                else:
+                    parts.append(f"{layer} not used")
+            return "; ".join(parts)
+
+
+layer_stats = LayerStats()
+
+# Runs layers off the fetch worker so a slow layer can be raced by the next one
+_hedge_pool = ThreadPoolExecutor(max_workers=max(2, FETCH_CONCURRENCY * 2))
+
+_LAYER_FETCHERS = {
+    "transcript-api": _fetch_via_transcript_api,
+    "yt-dlp": _fetch_via_ytdlp,
+}
+
+
+def _run_layer(layer: str, video_id: str) -> Optional[str]:
+    """Run one caption layer, recording its latency without any rate limiter wait.
+
+    The wait reflects our own request pacing, not the layer: counting it would
+    push the p90 over HEDGE_AFTER_SECONDS whenever the limiter is the bottleneck.
+    """
+    with span(f"transcript.{layer}", video_id=video_id) as layer_span:
+        start = time.monotonic()
+        throttled = _throttled_seconds()
+        text = _LAYER_FETCHERS[layer](video_id)
+        waited = _throttled_seconds() - throttled
+        layer_stats.record(layer, bool(text), time.monotonic() - start - waited)
+        layer_span.set(success=bool(text), bytes=len(text.encode("utf-8")) if text else 0, throttled_seconds=waited)
+    return text
+
+
+def _hedged(video_id: str, primary: str, backup: str) -> tuple[Optional[str], Optional[str]]:
+    """Run `primary`; if it is still going after HEDGE_AFTER_SECONDS, race `backup` against it.
+
+    Returns (layer, text) from whichever succeeds first, or (None, None). If the
+    primary fails quickly, the backup simply runs next.
+    """
+    futures = {submit(_hedge_pool, _run_layer, primary, video_id): primary}
+    done, _ = wait(futures, timeout=HEDGE_AFTER_SECONDS)
+    if not done:
+        print(f"    [{primary}] Slow, hedging with {backup}...")
+        futures[submit(_hedge_pool, _run_layer, backup, video_id)] = backup
+
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            text = future.result()
+            if text:
+                return futures[future], text
+
+    if len(futures) == 1:
+        print(f"    [{primary}] Failed, trying {backup}...")
+        text = _run_layer(backup, video_id)
+        if text:
+            return backup, text
+    return None, None
 
-    # Layer 1: youtube-transcript-api
-    text = _fetch_via_transcript_api(video_id)
-    if text:
-        print(f"    [transcript-api] Success")
-        return text
 
-    print(f"    [transcript-api] Failed, trying yt-dlp...")
+# ---------------------------------------------------------------------------
+# Main transcript fetcher — checks the cache, then tries the layers
+# ---------------------------------------------------------------------------
 
-    # Layer 2: yt-dlp subtitle extraction
-    text = _fetch_via_ytdlp(video_id)
-    if text:
-        return text
+def _fetch_transcript(
+    video_id: str, description: Optional[str] = None
+) -> tuple[Optional[str], Optional[str]]:
+    """Run the 3-layer fallback strategy. Returns (layer, text), or (None, None).
+
+    The caption layers run in the order chosen by layer_stats, with hedging when
+    the first layer's tail latency is high (but not while the rate limiter is
+    empty, since the backup would only queue behind the same limiter); the
+    description fallback is last.
+    """
+    layers = layer_stats.plan()
+    while layers:
+        layer = layers.pop(0)
+        if (layers and layer_stats.p90_latency(layer) > HEDGE_AFTER_SECONDS
+                and not _RATE_LIMITERS[YOUTUBE_HOST].empty()):
+            winner, text = _hedged(video_id, layer, layers.pop(0))
+        else:
+            winner, text = layer, _run_layer(layer, video_id)
+        if text:
+            print(f"    [{winner}] Success")
+            return winner, text
+        print(f"    [{layer}] Failed")
 
-    print(f"    [yt-dlp] Failed, trying video description...")
+    print(f"    Caption layers failed, trying video description...")
 
     # Layer 3: Video description fallback
-    desc = _get_full_description(video_id)
+    if description is not None:
+        desc = description if len(description) > 100 else None
+    else:
+        with span("transcript.description", video_id=video_id):
+            desc = _get_full_description(video_id)
     if desc:
         print(f"    [description] Using as fallback")
-        return "[VIDEO DESCRIPTION - no transcript available]\n\n" + desc
+        return "description", "[VIDEO DESCRIPTION - no transcript available]\n\n" + desc
 
     print(f"    No transcript or description available")
-    return None
+    return None, None
+
+
+def get_transcript(video_id: str, description: Optional[str] = None) -> Optional[str]:
+    """Fetch transcript from the local cache, falling back to a live 3-layer fetch.
+
+    `description` is the video's full description when already known (see
+    enrich_videos); otherwise layer 3 looks it up.
+    """
+    with span("transcript", video_id=video_id) as transcript_span:
+        cache = get_transcript_cache()
+        cached = cache.get(video_id)
+        if cached is not None:
+            layer, text = cached
+            transcript_span.set(cached=True, layer=layer)
+            print(f"  Transcript for {video_id}: cached ({layer or 'none available'})")
+            return text
+
+        print(f"  Fetching transcript for {video_id}...")
+        layer, text = _fetch_transcript(video_id, description)
+        transcript_span.set(cached=False, layer=layer)
+        cache.put(video_id, layer, text)
+        return text
+
+
+def _attach_transcript(video: dict) -> Optional[dict]:
+    transcript = get_transcript(video["video_id"], video.get("full_description"))
+    if not transcript:
+        print(f"  - {video['channel']}: {video['title']} (no transcript)")
+        return None
+    video["transcript"] = transcript
+    print(f"  + {video['channel']}: {video['title']}")
+    return video
+
+
+def iter_videos_with_transcripts(videos: list[dict]) -> Iterator[dict]:
+    """Yield each video with its transcript attached as soon as that transcript is ready.
+
+    Transcripts are fetched by FETCH_CONCURRENCY workers; request pacing is left to
+    the per-host rate limiters. Videos come out in completion order, and videos
+    without any text content are skipped.
+    """
+    count = 0
+    with ThreadPoolExecutor(max_workers=max(1, FETCH_CONCURRENCY)) as pool:
+        for future in as_completed([submit(pool, _attach_transcript, v) for v in videos]):
+            video = future.result()
+            if video is not None:
+                count += 1
+                yield video
+    print(f"Fetched transcripts for {count} video(s) — {layer_stats.report()}")
+    layer_stats.save()
 
 
 def fetch_videos_with_transcripts(channel_ids: list[str]) -> list[dict]:
-    """Fetch new videos and attach transcripts. Skips videos without any text content."""
-    videos = get_new_videos(channel_ids)
-    print(f"Found {len(videos)} new video(s) across {len(channel_ids)} channel(s)")
+    """Fetch new videos and attach transcripts. Skips videos without any text content.
 
-    results = []
-    for i, video in enumerate(videos):
-        # Add delay between requests to avoid rate limiting
-        if i > 0:
-            time.sleep(REQUEST_DELAY_SECONDS)
-
-        transcript = get_transcript(video["video_id"])
-        if transcript:
-            video["transcript"] = transcript
-            results.append(video)
-            print(f"  + {video['channel']}: {video['title']}")
-        else:
-            print(f"  - {video['channel']}: {video['title']} (no transcript)")
+    Results keep the order returned by get_new_videos.
+    """
+    videos = enrich_videos(get_new_videos(channel_ids))
+    print(f"Found {len(videos)} new video(s) across {len(channel_ids)} channel(s)")
 
-    print(f"Fetched transcripts for {len(results)} video(s)")
-    return results
+    fetched = {v["video_id"] for v in iter_videos_with_transcripts(videos)}
+    return [v for v in videos if v["video_id"] in fetched]